@@ -36,23 +36,20 @@ class Autoregression(MetaIDS):
     def _calc_residual(self, values, coefficients):
         return sum([val * coeff for val, coeff in zip(values, coefficients[::-1])])
 
+    def requires_fields(self):
+        return [["state", self.settings["sensor"]]]
+
     def train(self, ipal=None, state=None):
         training_data = []
 
         # Load training data for each sensor
-        with self._open_file(state) as f:
-
-            for line in f.readlines():
-                cur_state = json.loads(line)
-
-                if self.settings["sensor"] in cur_state["state"]:
-                    training_data.append(cur_state["state"][self.settings["sensor"]])
-                else:
-                    settings.logger.info(
-                        "Sensor {} not in current state.".format(
-                            self.settings["sensor"]
-                        )
-                    )
+        for cur_state in self._load_training_msgs(state):
+            if self.settings["sensor"] in cur_state["state"]:
+                training_data.append(cur_state["state"][self.settings["sensor"]])
+            else:
+                settings.logger.info(
+                    "Sensor {} not in current state.".format(self.settings["sensor"])
+                )
 
         if self.settings["firstN"] is None:
             settings.logger.info("Setting firstN for default 80%")
@@ -189,7 +189,7 @@ class BLSTM(FeatureIDS):
 
         if "adjust" in self.settings:  # Annotate offset for adjust script
             offsets = list(range(-self.parameters["sequence_length"] + 1, 1))
-            msg["adjust"] = list(zip(offsets, alerts, predict))
+            msg["adjust"] = self._adjust_ranges(offsets, alerts, predict)
 
         return any(alerts), max(predict)
 
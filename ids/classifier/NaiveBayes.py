@@ -71,10 +71,16 @@ class NaiveBayes(FeatureIDS):
         alert = bool(self.nbc.predict([state])[0])
         return alert, 1 if alert else 0
 
+    def new_state_msgs(self, msgs):
+        return self._classify_batch(msgs, self.nbc.predict, skipped=(False, False))
+
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
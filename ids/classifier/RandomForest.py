@@ -112,10 +112,16 @@ class RandomForest(FeatureIDS):
         # alert = bool(prediction > 0.5)
         # return alert, prediction
 
+    def new_state_msgs(self, msgs):
+        return self._classify_batch(msgs, self.rfc.predict)
+
     def new_ipal_msg(self, msg):
         # There is no difference for this IDS in state or message format! It only depends on the configuration which features are used.
         return self.new_state_msg(msg)
 
+    def new_ipal_msgs(self, msgs):
+        return self.new_state_msgs(msgs)
+
     def save_trained_model(self):
         if self.settings["model-file"] is None:
             return False
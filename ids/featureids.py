@@ -2,10 +2,17 @@ import json
 import math
 import time
 
+from operator import itemgetter
+
+import numpy as np
+
 from collections.abc import Iterable
 
+import ipal_iids.cache as cache
 import ipal_iids.settings as settings
 
+from ipal_iids.arrays import GrowableArray, tolist
+
 from preprocessors.utils import get_all_preprocessors
 from .ids import MetaIDS
 
@@ -19,8 +26,11 @@ class FeatureIDS(MetaIDS):
         "trainon": 1.0,  # Train preprocessor on 100% and IDS on first x% of the data
         "save-training": None,
         "allow-none": False,
+        "hash-function": "crc32",  # Fingerprint of the "hash" feature, crc32 or sha1
+        "hash-bytes": 2,  # Width of the "hash" feature (crc32: up to 4, sha1: 20)
     }
     _supports_preprocessor = True
+    _chunk_size = 65536  # rows converted to Python lists at once for preprocessing
 
     preprocessors = []
 
@@ -38,6 +48,7 @@ class FeatureIDS(MetaIDS):
 
         self.preprocessors = []
         self.features = []
+        self._compile_features()
 
     def _get_val(self, msg, val):
         # Lookup value
@@ -67,11 +78,156 @@ class FeatureIDS(MetaIDS):
         except ValueError:  # Non-float data
             return msg
 
+    def requires_fields(self):
+        fields = [f.split(";") for f in self.settings["features"]]
+        if ["hash"] in fields:
+            fields += [[field] for field in self._hash_fields]
+
+        return fields + [["timestamp"], ["malicious"]]
+
+    # Compile the features into groups sharing the same path to their last key, e.g.,
+    # "state;a" and "state;b", such that each group is looked up at once. Groups are
+    # plain data (path, getter of the last keys, number of keys) and thus picklable
+    def _compile_features(self):
+        groups = {}
+        for i, feature in enumerate(self.features):
+            groups.setdefault(tuple(feature[:-1]), []).append((feature[-1], i))
+
+        self._feature_groups = [
+            (path, itemgetter(*[key for key, _ in keys]), len(keys))
+            for path, keys in groups.items()
+        ]
+
+        # Restore the order of the features from the order of the groups
+        order = [i for keys in groups.values() for _, i in keys]
+        self._feature_order = None
+        if order != list(range(len(order))):
+            self._feature_order = [order.index(i) for i in range(len(order))]
+
+        self._feature_hash = ["hash"] in self.features
+        maximum = self._hash_functions.get(self.settings["hash-function"], 0)
+        if self._feature_hash and not 0 < self.settings["hash-bytes"] <= maximum:
+            settings.logger.critical(
+                "Unsupported hash-function {} with {} hash-bytes".format(
+                    self.settings["hash-function"], self.settings["hash-bytes"]
+                )
+            )
+            exit(1)
+
+    def _lookup_features(self, msg):
+        values = []
+        for path, getter, n in self._feature_groups:
+            node = msg
+            for key in path:
+                node = node[key]
+
+            if n == 1:
+                values.append(float(getter(node)))
+            else:
+                values += map(float, getter(node))
+
+        total = sum(values)
+        if total != total:  # NaN (or infinities of both signs) in the values
+            raise ValueError
+
+        if self._feature_order is not None:
+            values = [values[i] for i in self._feature_order]
+        return values
+
     def _extract_features(self, msg):
-        if ["hash"] in self.features:
-            self._add_msg_hash(msg, nbytes=2)
+        if self._feature_hash:  # Shallow copy, the message must not be altered
+            msg = {
+                **msg,
+                "hash": self._msg_hash(
+                    msg,
+                    nbytes=self.settings["hash-bytes"],
+                    function=self.settings["hash-function"],
+                ),
+            }
+
+        try:
+            return self._lookup_features(msg)
+        except (KeyError, IndexError, TypeError, ValueError):
+            # Missing, None, NaN or non-numeric values take the path walking lookup
+            # to keep its warnings and results
+            return [self._get_val(msg, feature) for feature in self.features]
+
+    # Arrays collecting events, annotations and timestamps, stored on disk with
+    # --train.spill. Non-numeric events are kept in memory
+    def _growable_arrays(self):
+        return (
+            GrowableArray(rows=True, directory=settings.train_spill),
+            GrowableArray(dtype=bool, directory=settings.train_spill),
+            GrowableArray(directory=settings.train_spill),
+        )
+
+    # Extract the raw features of all training messages or load them from the cache
+    def _load_features(self, filename):
+        key = cache.key(
+            filename,
+            [
+                self.settings["features"],
+                self.settings["allow-none"],
+                self._hash_fields,
+                self.settings["hash-function"],
+                self.settings["hash-bytes"],
+            ],
+        )
 
-        return [self._get_val(msg, feature) for feature in self.features]
+        cached = cache.load(key)
+        if cached is not None:
+            return cached
+
+        events, annotations, timestamps = self._growable_arrays()
+
+        for msg in self._load_training_msgs(filename):
+            features = self._extract_features(msg)
+
+            if None not in features or self.settings["allow-none"]:
+                events.append(features)
+                annotations.append(msg["malicious"])
+                timestamps.append(msg["timestamp"])
+            else:
+                settings.logger.info("None in state. Skipping message!")
+
+        events = events.array()
+        annotations = annotations.array()
+        timestamps = timestamps.array()
+
+        cache.save(key, events, annotations, timestamps)
+        return events, annotations, timestamps
+
+    # Apply fn to all rows chunk by chunk, such that only a chunk of rows is held as
+    # Python lists at a time. Rows for which fn returns None are removed
+    def _map_rows(self, fn, events, annotations, timestamps):
+        out, out_annotations, out_timestamps = self._growable_arrays()
+
+        for start in range(0, len(events), self._chunk_size):
+            end = start + self._chunk_size
+
+            for e, a, t in zip(
+                tolist(events[start:end]),
+                tolist(annotations[start:end]),
+                tolist(timestamps[start:end]),
+            ):
+                e = fn(e)
+                if e is not None:
+                    out.append(e)
+                    out_annotations.append(a)
+                    out_timestamps.append(t)
+
+        return out.array(), out_annotations.array(), out_timestamps.array()
+
+    # Fit a preprocessor chunk by chunk if it supports it. Others are given all rows at
+    # once, converted to lists as the rows given to transform
+    def _fit_preprocessor(self, pre, events):
+        if not pre.supports_partial_fit():
+            pre.fit(tolist(events))
+            return
+
+        for start in range(0, len(events), self._chunk_size):
+            pre.partial_fit(tolist(events[start : start + self._chunk_size]))
+        pre.finish_fit()
 
     # the IDS is given the path to file(s) containing its requested training data
     def train(self, state=None):
@@ -82,52 +238,41 @@ class FeatureIDS(MetaIDS):
             self.preprocessors.append(get_all_preprocessors()[pre["method"]](apply))
 
         self.features = [f.split(";") for f in self.settings["features"]]
-
-        events = []
-        annotations = []
-        timestamps = []
+        self._compile_features()
 
         # Load features from training file
         start = time.time()
         settings.logger.info("Loading training file started at {}".format(start))
 
-        with self._open_file(state) as state_file:
-            for msg in state_file.readlines():
-                msg = json.loads(msg)
-                state = self._extract_features(msg)
-
-                if None not in state or self.settings["allow-none"]:
-                    events.append(state)
-                    annotations.append(msg["malicious"])
-                    timestamps.append(msg["timestamp"])
-                else:
-                    settings.logger.info("None in state. Skipping message!")
+        events, annotations, timestamps = self._load_features(state)
 
         end = time.time()
         settings.logger.info(
             "Loading training file ended at {} ({}s)".format(end, end - start)
         )
 
-        # Train and apply preprocessors
+        # Train and apply preprocessors. Events, annotations and timestamps are removed
+        # if the preprocessor removed the event
         settings.logger.info("Raw features: {}".format(events[0]))
         for pre in self.preprocessors:
-            pre.fit(events)
-            events = [pre.transform(e) for e in events]
-
-            # Remove events, annotations and timestamps if event got removed
-            events, annotations, timestamps = zip(
-                *[
-                    (e, a, t)
-                    for e, a, t in zip(events, annotations, timestamps)
-                    if e is not None
-                ]
+            self._fit_preprocessor(pre, events)
+            events, annotations, timestamps = self._map_rows(
+                pre.transform, events, annotations, timestamps
             )
             assert len(events) == len(annotations) == len(timestamps)
             settings.logger.info("{} features: {}".format(pre._name, events[0]))
 
-        events = [list(self.__flatten(e)) for e in events]
+        # Numeric matrices are flat already
+        if not (isinstance(events, np.ndarray) and events.dtype == np.float64):
+            events, annotations, timestamps = self._map_rows(
+                lambda e: list(self.__flatten(e)), events, annotations, timestamps
+            )
         settings.logger.info("Final features: {}".format(events[0]))
 
+        # Numeric events are kept as matrix, annotations and timestamps become lists
+        annotations = tolist(annotations)
+        timestamps = tolist(timestamps)
+
         end2 = time.time()
         settings.logger.info("Preprocessing ended at {} ({}s)".format(end2, end2 - end))
 
@@ -161,7 +306,10 @@ class FeatureIDS(MetaIDS):
         return events[:N], annotations[:N], timestamps[:N]
 
     def new_state_msg(self, msg):
+        return self._preprocess_msg(msg)
 
+    # Extract the features of a message and apply the preprocessors
+    def _preprocess_msg(self, msg):
         state = self._extract_features(msg)
         if None in state and not self.settings["allow-none"]:
             settings.logger.info("None in state. Skipping message")
@@ -175,6 +323,29 @@ class FeatureIDS(MetaIDS):
         else:
             return list(self.__flatten(state))
 
+    # Classify a batch of messages with a single call of predict on the states of all
+    # messages yielding one. is_alert tells whether a prediction is an alert. Messages
+    # without a state, e.g., skipped by a preprocessor, return skipped
+    def _classify_batch(self, msgs, predict, is_alert=bool, skipped=(False, None)):
+        results = [skipped] * len(msgs)
+
+        indices = []
+        states = []
+        for i, msg in enumerate(msgs):
+            state = self._preprocess_msg(msg)
+            if state is not None:
+                indices.append(i)
+                states.append(state)
+
+        if len(states) == 0:
+            return results
+
+        for i, prediction in zip(indices, predict(states)):
+            alert = bool(is_alert(prediction))
+            results[i] = (alert, 1 if alert else 0)
+
+        return results
+
     def save_trained_model(self):
         model = {
             "features": self.features,
@@ -191,6 +362,11 @@ class FeatureIDS(MetaIDS):
         self.settings = model["settings"]
         self.features = model["features"]
 
+        # Models trained before the hash was configurable use two bytes of SHA-1
+        self.settings.setdefault("hash-function", "sha1")
+        self.settings.setdefault("hash-bytes", 2)
+        self._compile_features()
+
         for name, pre_model in model["preprocessors"]:
             self.preprocessors.append(
                 get_all_preprocessors()[name].from_fitted_model(pre_model)
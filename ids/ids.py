@@ -1,12 +1,16 @@
-import gzip
 import hashlib
 import json
-import sys
+import zlib
 
+from collections import OrderedDict
 from pathlib import Path
 
+import ipal_iids.dataset as dataset
+import ipal_iids.modelfile as modelfile
 import ipal_iids.settings as settings
 
+from ipal_iids.files import open_file
+
 
 class MetaIDS:
 
@@ -15,6 +19,14 @@ class MetaIDS:
     _requires = []
     _metaids_default_settings = {"model-file": None}
     _supports_preprocessor = False
+    _hash_fields = ["src", "dest", "protocol", "activity", "type", "length", "data"]
+    # The fields identifying the kind of a message take few distinct values, hence their
+    # share of a crc32 fingerprint is memoized in a least recently used cache
+    _hash_prefix_fields = ["src", "dest", "type", "activity"]
+    _hash_suffix_fields = ["protocol", "length", "data"]
+    _hash_prefixes_size = 65536  # Maximum number of memoized prefixes
+    _hash_encoder = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+    _hash_functions = {"crc32": 4, "sha1": 20}  # Maximum number of bytes
 
     def __init__(self, name=None):
         self._name = name
@@ -23,6 +35,8 @@ class MetaIDS:
         self._default_settings = {}
         self._add_default_settings(self._metaids_default_settings)
 
+        self._hash_prefixes = OrderedDict()
+
     def _add_default_settings(self, settings):
         for key, value in settings.items():
             assert key not in self._default_settings
@@ -33,15 +47,13 @@ class MetaIDS:
                 self.settings[key] = value
 
     def _open_file(self, filename, mode="r"):
-        filename = str(filename)
-        if filename is None:
-            return None
-        elif filename.endswith(".gz"):
-            return gzip.open(filename, mode)
-        elif filename == "-":
-            return sys.stdin
-        else:
-            return open(filename, mode)
+        return open_file(filename, mode)
+
+    # Iterable over the messages of a training file. The file is parsed once and shared
+    # among all IDSs, hence the contained values must not be altered. Messages may only
+    # contain the fields returned by requires_fields
+    def _load_training_msgs(self, filename):
+        return dataset.load(filename)
 
     def _relative_to_config(self, file: str) -> Path:
         """
@@ -61,23 +73,90 @@ class MetaIDS:
             raise Exception("Can't resolve model file since no model file was provided")
         return self._relative_to_config(self.settings["model-file"])
 
-    def _add_msg_hash(self, msg, nbytes=2):
-        fingerprint = json.dumps(
-            [
-                msg["src"],
-                msg["dest"],
-                msg["protocol"],
-                msg["activity"],
-                msg["type"],
-                msg["length"],
-                msg["data"],
-                # not id, timestamp, responds_to, malicious
-            ]
-        )
+    # Write a model to the model file. Model files ending with .bin (or .bin.gz) use the
+    # binary container of modelfile, which loads large tables much faster, all other
+    # files are written as human-readable JSON
+    def _write_model(self, model):
+        path = self._resolve_model_file_path()
+        if modelfile.is_binary(path):
+            modelfile.save(path, model)
+        else:
+            with self._open_file(path, "wt") as f:
+                f.write(json.dumps(model, indent=4) + "\n")
+
+    # Read a model written by _write_model. Raises FileNotFoundError if there is none
+    def _read_model(self):
+        path = self._resolve_model_file_path()
+        if modelfile.is_binary(path):
+            return modelfile.load(path)
+
+        with self._open_file(path, "rt") as f:
+            return json.load(f)
+
+    # Convert the keys of a model table to numbers, which are strings in JSON model
+    # files only. Tables of binary model files are returned as they are
+    @staticmethod
+    def _model_table(table):
+        if not isinstance(next(iter(table), None), str):
+            return table
+        return {float(k) if "." in k else int(k): v for k, v in table.items()}
+
+    # Alarm adjustment for ipal-extend-alarms setting the alert and metric of all
+    # messages from offset start to end (both included and <= 0). Ranges are written
+    # as [start, end, alert, metric], single offsets as [offset, alert, metric]
+    @staticmethod
+    def _adjust_entry(start, end, alert, metric):
+        if start == end:
+            return [start, alert, metric]
+        return [start, end, alert, metric]
+
+    # Alarm adjustments of the given offsets. Consecutive offsets with the same alert
+    # and metric are merged into ranges
+    @staticmethod
+    def _adjust_ranges(offsets, alerts, metrics):
+        ranges = []
+        for offset, alert, metric in zip(offsets, alerts, metrics):
+            if (
+                len(ranges) > 0
+                and ranges[-1][1] + 1 == offset
+                and ranges[-1][2:] == [alert, metric]
+            ):
+                ranges[-1][1] = offset
+            else:
+                ranges.append([offset, offset, alert, metric])
+        return [MetaIDS._adjust_entry(*r) for r in ranges]
+
+    def _crc32_fingerprint(self, msg):
+        # Values are encoded as canonical JSON, which differs for, e.g., 1, 1.0 and true.
+        # These are equal as dict keys though, hence the types are part of the memo key
+        prefix = tuple(msg[field] for field in self._hash_prefix_fields)
+        try:
+            key = (prefix, tuple(map(type, prefix)))
+            crc = self._hash_prefixes[key]
+            self._hash_prefixes.move_to_end(key)
+        except KeyError:
+            crc = zlib.crc32(self._hash_encoder.encode(prefix).encode("utf-8"))
+            self._hash_prefixes[key] = crc
+            if len(self._hash_prefixes) > self._hash_prefixes_size:
+                self._hash_prefixes.popitem(last=False)
+        except TypeError:  # Unhashable values, e.g., lists
+            crc = zlib.crc32(self._hash_encoder.encode(prefix).encode("utf-8"))
+
+        suffix = tuple(msg[field] for field in self._hash_suffix_fields)
+        return zlib.crc32(self._hash_encoder.encode(suffix).encode("utf-8"), crc)
+
+    # Hash of the fields identifying a message, truncated to nbytes. The message is not
+    # altered as it may be shared with other IDSs
+    def _msg_hash(self, msg, nbytes=2, function="sha1"):
+        if function == "crc32":
+            return self._crc32_fingerprint(msg) & ((1 << 8 * nbytes) - 1)
+
+        # not id, timestamp, responds_to, malicious
+        fingerprint = json.dumps([msg[field] for field in self._hash_fields])
 
         # Create n-byte hash of the fingerprint
         fingerprint = fingerprint.encode("utf-8")
-        msg["hash"] = int(hashlib.sha1(fingerprint).hexdigest()[: nbytes * 2], 16)
+        return int(hashlib.sha1(fingerprint).hexdigest()[: nbytes * 2], 16)
 
     # what data (ipal messages / state informatin) does this IDS need for its learning and intrusion detection phase?
     def requires(self, dataformat):
@@ -87,6 +166,12 @@ class MetaIDS:
             )
         return dataformat in self._requires
 
+    # which fields of a message does this IDS access during training and live phase? Each
+    # field is a list of keys leading to it, e.g., ["state", "sensor"]. Returning None
+    # indicates that the whole message is required.
+    def requires_fields(self):
+        return None
+
     # the IDS is given the path to file(s) containing its requested training data
     def train(self, ipal=None, state=None):
         raise NotImplementedError
@@ -101,6 +186,15 @@ class MetaIDS:
     def new_state_msg(self, msg):
         raise NotImplementedError
 
+    # batched variants of new_ipal_msg and new_state_msg. Messages are handed over in
+    # their original order and a list with one (alert, metric) tuple per message is
+    # expected. IDSs may override these to process a batch with a single vectorized call
+    def new_ipal_msgs(self, msgs):
+        return [self.new_ipal_msg(msg) for msg in msgs]
+
+    def new_state_msgs(self, msgs):
+        return [self.new_state_msg(msg) for msg in msgs]
+
     def save_trained_model(self):
         raise NotImplementedError
 
@@ -39,20 +39,21 @@ class InterArrivalTimeRange(MetaIDS):
         identifier += msg["data"].keys()
         return "-".join([str(i) for i in identifier])
 
+    def requires_fields(self):
+        fields = ["src", "dest", "activity", "type", "data", "timestamp", "malicious"]
+        return [[field] for field in fields]
+
     def train(self, ipal=None, state=None):
         events = {}
 
         # Load timestamps for each identifier
-        with self._open_file(ipal) as f:
-            for line in f.readlines():
-                ipal_msg = json.loads(line)
-
-                timestamp = ipal_msg["timestamp"]
-                identifier = self._get_identifier(ipal_msg)
+        for ipal_msg in self._load_training_msgs(ipal):
+            timestamp = ipal_msg["timestamp"]
+            identifier = self._get_identifier(ipal_msg)
 
-                if identifier not in events:
-                    events[identifier] = []
-                events[identifier].append(timestamp)
+            if identifier not in events:
+                events[identifier] = []
+            events[identifier].append(timestamp)
 
         # Calculate inter-arrival time and range model
         settings.logger.info("Inter-arrival-time range models:")
@@ -149,8 +150,7 @@ class InterArrivalTimeRange(MetaIDS):
             "range_model": self.range_model,
         }
 
-        with self._open_file(self._resolve_model_file_path(), mode="wt") as f:
-            f.write(json.dumps(model, indent=4) + "\n")
+        self._write_model(model)
 
         return True
 
@@ -159,8 +159,7 @@ class InterArrivalTimeRange(MetaIDS):
             return False
 
         try:  # Open model file
-            with self._open_file(self._resolve_model_file_path(), mode="rt") as f:
-                model = json.load(f)
+            model = self._read_model()
         except FileNotFoundError:
             settings.logger.info(
                 "Model file {} not found.".format(str(self._resolve_model_file_path()))
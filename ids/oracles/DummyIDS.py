@@ -16,6 +16,9 @@ class DummyIDS(MetaIDS):
         super().__init__(name=name)
         self._add_default_settings(self._optimalids_default_settings)
 
+    def requires_fields(self):
+        return []
+
     def train(self, ipal=None, state=None):
         pass
 
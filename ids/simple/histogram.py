@@ -1,7 +1,8 @@
-import json
+import numpy as np
 
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
+from ipal_iids.arrays import column, encode, tolist
 
 
 class Histogram(FeatureIDS):
@@ -25,22 +26,21 @@ class Histogram(FeatureIDS):
         self._reset()
 
     def _reset(self):
-        self._cur = {}
-        self._buffer = {}
-
-    def _update(self, sensor, value):
-
-        if sensor not in self._cur:
-            self._cur[sensor] = {i: 0 for i in self.hist[sensor].keys()}
-            self._buffer[sensor] = []
-
-        self._cur[sensor][value] += 1
-        self._buffer[sensor].append(value)
+        # Sliding window of each discrete sensor checked against its histogram
+        self._windows = {}
+        for sensor, hist in self.hist.items():
+            if hist is None:
+                continue
 
-        if len(self._buffer[sensor]) > self.settings["window_size"]:
-            self._cur[sensor][self._buffer[sensor].pop(0)] -= 1
+            low, high = [], []
+            for val, (tmin, tmax) in hist.items():
+                err = self.deltas[sensor][val] * self.settings["threshold"]
+                low.append(tmin - err)
+                high.append(tmax + err)
 
-        return len(self._buffer[sensor]) == self.settings["window_size"]
+            self._windows[sensor] = _Window(
+                hist.keys(), low, high, self.settings["window_size"]
+            )
 
     def train(self, ipal=None, state=None):
         if ipal is not None and state is not None:
@@ -55,41 +55,34 @@ class Histogram(FeatureIDS):
         if len(set(annotations) - set([False])) > 0:
             settings.logger.warning("IDS expects benign data only!")
 
-        # Prepare data structures and find non-discrete values
-        hist = {}
+        # Count the values of each discrete sensor in all windows of the training data,
+        # the histogram holds their minimum and maximum counts
+        size = self.settings["window_size"]
         for i in range(len(events[0])):
 
-            vals = set([e[i] for e in events])
+            values = column(events, i)
+            vals = set(tolist(values))
             if len(vals) > self.settings["discrete_threshold"]:  # Skip non-discrete
-                hist[i] = None
                 self.hist[i] = None
                 self.deltas[i] = None
-
-            else:  # Prepare histogram
-                hist[i] = {val: [] for val in vals}
-                self.hist[i] = {val: [self.settings["window_size"], 0] for val in vals}
-                self.deltas[i] = {val: None for val in vals}
-
-        # Train on input
-        for e in events:
-            for i in range(len(events[0])):  # For each sensor
-                if self.hist[i] is None:  # Skip non-discrete sensors
-                    continue
-
-                complete = self._update(i, e[i])
-                if complete:  # Store histogram
-                    for val in self.hist[i]:
-                        hist[i][val].append(self._cur[i][val])
-
-        # Calculate deltas and real values
-        for i in range(len(events[0])):
-
-            if self.hist[i] is None:  # Skip non-discrete sensors
                 settings.logger.info("Sensor {} ignored".format(i))
                 continue
 
-            for val in self.hist[i]:
-                self.hist[i][val] = [min(hist[i][val]), max(hist[i][val])]
+            if len(events) < size:
+                settings.logger.error(
+                    "Histogram requires window_size ({}) training events".format(size)
+                )
+                exit(1)
+
+            codes = encode(values, vals)
+            self.hist[i] = {}
+            self.deltas[i] = {}
+            for code, val in enumerate(vals):
+                # Count of the value in the windows ending at each event
+                cumsum = np.concatenate(([0], np.cumsum(codes == code)))
+                counts = cumsum[size:] - cumsum[: len(codes) - size + 1]
+
+                self.hist[i][val] = [int(counts.min()), int(counts.max())]
                 self.deltas[i][val] = (self.hist[i][val][1] - self.hist[i][val][0]) / 2
 
                 settings.logger.info(
@@ -105,17 +98,6 @@ class Histogram(FeatureIDS):
         # Reset values
         self._reset()
 
-    def _is_valid(self, sensor):
-        for val in self.hist[sensor]:  # One failed bucket suffices
-            tmin, tmax = self.hist[sensor][val]
-            err = self.deltas[sensor][val] * self.settings["threshold"]
-            cur = self._cur[sensor][val]
-
-            if cur < tmin - err or tmax + err < cur:  # Outside the histogram
-                return False
-
-        return True
-
     def new_state_msg(self, msg):
         state = super().new_state_msg(msg)
         if state is None:
@@ -123,17 +105,14 @@ class Histogram(FeatureIDS):
 
         alert = False
 
-        for i in range(len(state)):
-            if self.hist[i] is None:  # Ignore sensors with too many values
-                continue
-
-            if state[i] not in self.hist[i]:  # Alert unknown value
+        # Sensors with too many values are ignored
+        for i, window in self._windows.items():
+            code = window.codes.get(state[i])
+            if code is None:  # Alert unknown value
                 alert = True
 
-            else:
-                complete = self._update(i, state[i])
-                if complete and not self._is_valid(i):
-                    alert = True
+            elif window.add(code) and window.violations > 0:  # Outside the histogram
+                alert = True
 
         return alert, 1 if alert else 0
 
@@ -153,8 +132,7 @@ class Histogram(FeatureIDS):
             "deltas": self.deltas,
         }
 
-        with self._open_file(self._resolve_model_file_path(), "wt") as f:
-            f.write(json.dumps(model, indent=4))
+        self._write_model(model)
 
         return True
 
@@ -163,8 +141,7 @@ class Histogram(FeatureIDS):
             return False
 
         try:  # Open model file
-            with self._open_file(self._resolve_model_file_path(), "rt") as f:
-                model = json.loads(f.read())
+            model = self._read_model()
         except FileNotFoundError:
             settings.logger.info(
                 "Model file {} not found.".format(str(self._resolve_model_file_path()))
@@ -182,14 +159,10 @@ class Histogram(FeatureIDS):
 
         for k, v in self.hist.items():  # str -> int for keys
             if v is not None:
-                self.hist[k] = {
-                    float(kk) if "." in kk else int(kk): vv for kk, vv in v.items()
-                }
+                self.hist[k] = self._model_table(v)
         for k, v in self.deltas.items():  # str -> int for keys
             if v is not None:
-                self.deltas[k] = {
-                    float(kk) if "." in kk else int(kk): vv for kk, vv in v.items()
-                }
+                self.deltas[k] = self._model_table(v)
 
         self._reset()
 
@@ -246,3 +219,61 @@ class Histogram(FeatureIDS):
             axs[i].axis("off")
 
         return plt, fig
+
+
+class _Window:
+
+    # Sliding window over the values of a sensor. Values are mapped to codes, the codes
+    # in the window are kept in a ring buffer, and their counts in a list indexed by
+    # code. The number of codes whose count lies outside [low, high] is updated with
+    # each change, such that adding a value takes constant time regardless of the
+    # window size and number of values.
+    __slots__ = [
+        "codes",
+        "low",
+        "high",
+        "size",
+        "ring",
+        "pos",
+        "fill",
+        "counts",
+        "violations",
+    ]
+
+    def __init__(self, values, low, high, size):
+        self.codes = {val: code for code, val in enumerate(values)}
+        self.low = low
+        self.high = high
+
+        self.size = size
+        self.ring = [0] * size
+        self.pos = 0
+        self.fill = 0
+
+        self.counts = [0] * len(self.codes)
+        self.violations = sum(1 for lo, hi in zip(low, high) if 0 < lo or hi < 0)
+
+    def _change(self, code, delta):
+        count = self.counts[code]
+        low = self.low[code]
+        high = self.high[code]
+
+        violated = count < low or high < count
+        count += delta
+        self.counts[code] = count
+        self.violations += (count < low or high < count) - violated
+
+    # Add a value code and evict the oldest one. Returns whether the window is complete
+    def add(self, code):
+        if self.fill == self.size:
+            self._change(self.ring[self.pos], -1)
+        else:
+            self.fill += 1
+
+        self._change(code, 1)
+        self.ring[self.pos] = code
+        self.pos += 1
+        if self.pos == self.size:
+            self.pos = 0
+
+        return self.fill == self.size
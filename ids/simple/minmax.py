@@ -1,5 +1,3 @@
-import json
-
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
 
@@ -79,8 +77,7 @@ class MinMax(FeatureIDS):
             "deltas": self.deltas,
         }
 
-        with self._open_file(self._resolve_model_file_path(), "wt") as f:
-            f.write(json.dumps(model, indent=4))
+        self._write_model(model)
 
         return True
 
@@ -89,8 +86,7 @@ class MinMax(FeatureIDS):
             return False
 
         try:  # Open model file
-            with self._open_file(self._resolve_model_file_path(), "rt") as f:
-                model = json.loads(f.read())
+            model = self._read_model()
         except FileNotFoundError:
             settings.logger.info(
                 "Model file {} not found.".format(str(self._resolve_model_file_path()))
@@ -1,7 +1,8 @@
-import json
+import numpy as np
 
 import ipal_iids.settings as settings
 from ids.featureids import FeatureIDS
+from ipal_iids.arrays import column, encode, tolist
 
 
 class SteadyTime(FeatureIDS):
@@ -62,41 +63,37 @@ class SteadyTime(FeatureIDS):
         if len(set(annotations) - set([False])) > 0:
             settings.logger.warning("IDS expects benign data only!")
 
-        # Prepare data structures and find non-discrete values
-        time = {}
+        # Find the runs of each discrete sensor's values, i.e., the number of events the
+        # sensor kept a value. The last run is not complete and hence ignored
         for i in range(len(events[0])):
 
-            vals = set([e[i] for e in events])
+            values = column(events, i)
+            vals = set(tolist(values))
             if len(vals) > self.settings["discrete_threshold"]:  # Skip non-discrete
-                time[i] = None
                 self.time[i] = None
                 self.deltas[i] = None
-
-            else:  # Prepare time
-                time[i] = {val: [] for val in vals}
-                self.time[i] = {val: None for val in vals}
-                self.deltas[i] = {val: None for val in vals}
-
-        # Train on input
-        for e in events:
-            for i in range(len(events[0])):  # For each sensor
-                if self.time[i] is None:  # Skip non-discrete sensors
-                    continue
-
-                complete, val, t = self._update(i, e[i])
-                if complete:  # Store time
-                    time[i][val].append(t)
-
-        # Calculate deltas and real values
-        for i in range(len(events[0])):
-
-            if self.time[i] is None:  # Skip non-discrete sensors
                 settings.logger.info("Sensor {} ignored".format(i))
                 continue
 
-            for val in self.time[i]:
-                if len(time[i][val]) > 0:
-                    self.time[i][val] = [min(time[i][val]), max(time[i][val])]
+            codes = encode(values, vals)
+            starts = np.flatnonzero(np.diff(codes)) + 1
+            lengths = np.diff(starts, prepend=0)
+            codes = codes[starts - 1]  # Value of each completed run
+
+            # Minimum and maximum run length of each value
+            runs = np.bincount(codes, minlength=len(vals))
+            mins = np.full(len(vals), len(events))
+            maxs = np.zeros(len(vals), dtype=np.int64)
+            np.minimum.at(mins, codes, lengths)
+            np.maximum.at(maxs, codes, lengths)
+
+            self.time[i] = {}
+            self.deltas[i] = {}
+            for code, val in enumerate(vals):
+                self.time[i][val] = None
+                self.deltas[i][val] = None
+                if runs[code] > 0:
+                    self.time[i][val] = [int(mins[code]), int(maxs[code])]
                     self.deltas[i][val] = (
                         self.time[i][val][1] - self.time[i][val][0]
                     ) / 2
@@ -146,7 +143,7 @@ class SteadyTime(FeatureIDS):
                     if time > self.time[i][val][1]:  # only alert excess
                         time -= self.time[i][val][1]
 
-                    msg["adjust"] = [[t, True, 1] for t in range(-int(time), 0)]
+                    msg["adjust"] = [self._adjust_entry(-int(time), -1, True, 1)]
                     msg["adjust"] += [[0, False, 0]]  # Reset current alarm
 
         return alert, 1 if alert else 0
@@ -167,8 +164,7 @@ class SteadyTime(FeatureIDS):
             "deltas": self.deltas,
         }
 
-        with self._open_file(self._resolve_model_file_path(), "wt") as f:
-            f.write(json.dumps(model, indent=4))
+        self._write_model(model)
 
         return True
 
@@ -177,8 +173,7 @@ class SteadyTime(FeatureIDS):
             return False
 
         try:  # Open model file
-            with self._open_file(self._resolve_model_file_path(), "rt") as f:
-                model = json.loads(f.read())
+            model = self._read_model()
         except FileNotFoundError:
             settings.logger.info(
                 "Model file {} not found.".format(str(self._resolve_model_file_path()))
@@ -196,14 +191,10 @@ class SteadyTime(FeatureIDS):
 
         for k, v in self.time.items():  # str -> int for keys
             if v is not None:
-                self.time[k] = {
-                    float(kk) if "." in kk else int(kk): vv for kk, vv in v.items()
-                }
+                self.time[k] = self._model_table(v)
         for k, v in self.deltas.items():  # str -> int for keys
             if v is not None:
-                self.deltas[k] = {
-                    float(kk) if "." in kk else int(kk): vv for kk, vv in v.items()
-                }
+                self.deltas[k] = self._model_table(v)
 
         self._reset()
 
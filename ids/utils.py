@@ -1,37 +1,92 @@
-from .autoregression.Autoregression import Autoregression
-from .classifier.BLSTM import BLSTM
-from .classifier.DecisionTree import DecisionTree
-from .classifier.ExtraTrees import ExtraTrees
-from .classifier.IsolationForest import IsolationForest
-from .classifier.NaiveBayes import NaiveBayes
-from .classifier.RandomForest import RandomForest
-from .classifier.SVM import SVM
-from .interarrivaltime.Mean import InterArrivalTimeMean
-from .interarrivaltime.Range import InterArrivalTimeRange
-from .simple.histogram import Histogram
-from .simple.minmax import MinMax
-from .simple.steadytime import SteadyTime
-from .oracles.OptimalIDS import OptimalIDS
-from .oracles.DummyIDS import DummyIDS
+from ipal_iids.registry import Registry
 
-idss = [
-    Autoregression,
-    BLSTM,
-    DecisionTree,
-    DummyIDS,
-    ExtraTrees,
-    Histogram,
-    InterArrivalTimeMean,
-    InterArrivalTimeRange,
-    IsolationForest,
-    MinMax,
-    NaiveBayes,
-    OptimalIDS,
-    RandomForest,
-    SVM,
-    SteadyTime,
-]
+_all = ["train.ipal", "live.ipal", "train.state", "live.state"]
+_ipal = ["train.ipal", "live.ipal"]
+_state = ["train.state", "live.state"]
+
+# IDS name -> metadata with the "module:class" path. The modules are imported once an
+# IDS is used only. Further IDSs are discovered from the "ipal_iids.idss" entry points
+idss = Registry(
+    {
+        "Autoregression": {
+            "class": "ids.autoregression.Autoregression:Autoregression",
+            "description": "Autoregression and CUSUM",
+            "requires": _state,
+        },
+        "BLSTM": {
+            "class": "ids.classifier.BLSTM:BLSTM",
+            "description": "Bidirectional LSTM.",
+            "requires": _all,
+        },
+        "DecisionTree": {
+            "class": "ids.classifier.DecisionTree:DecisionTree",
+            "description": "Decision tree classifier.",
+            "requires": _all,
+        },
+        "Dummy": {
+            "class": "ids.oracles.DummyIDS:DummyIDS",
+            "description": "Dummy IDS returns either True or False.",
+            "requires": _all,
+        },
+        "ExtraTrees": {
+            "class": "ids.classifier.ExtraTrees:ExtraTrees",
+            "description": "Extra-trees classifier.",
+            "requires": _all,
+        },
+        "Histogram": {
+            "class": "ids.simple.histogram:Histogram",
+            "description": "Histogram of the process values within a sliding window.",
+            "requires": _all,
+        },
+        "inter-arrival-mean": {
+            "class": "ids.interarrivaltime.Mean:InterArrivalTimeMean",
+            "description": "Mean inter-arrival time",
+            "requires": _ipal,
+        },
+        "inter-arrival-range": {
+            "class": "ids.interarrivaltime.Range:InterArrivalTimeRange",
+            "description": "Range of mean inter-arrival time",
+            "requires": _ipal,
+        },
+        "IsolationForest": {
+            "class": "ids.classifier.IsolationForest:IsolationForest",
+            "description": "Isolation forest classifier.",
+            "requires": _all,
+        },
+        "MinMax": {
+            "class": "ids.simple.minmax:MinMax",
+            "description": "Minimum and maximum of the process values plus threshold.",
+            "requires": _all,
+        },
+        "NaiveBayes": {
+            "class": "ids.classifier.NaiveBayes:NaiveBayes",
+            "description": "Naive bayes classifier.",
+            "requires": _all,
+        },
+        "Optimal": {
+            "class": "ids.oracles.OptimalIDS:OptimalIDS",
+            "description": "Optimal IDS returns the malicious field as classification.",
+            "requires": _all,
+        },
+        "RandomForest": {
+            "class": "ids.classifier.RandomForest:RandomForest",
+            "description": "Random forest classifier.",
+            "requires": _all,
+        },
+        "SVM": {
+            "class": "ids.classifier.SVM:SVM",
+            "description": "SVM forest classifier.",
+            "requires": _all,
+        },
+        "Steadytime": {
+            "class": "ids.simple.steadytime:SteadyTime",
+            "description": "Shortest and longest time the process values remain steady.",
+            "requires": _all,
+        },
+    },
+    group="ipal_iids.idss",
+)
 
 
 def get_all_iidss():
-    return {ids._name: ids for ids in idss}
+    return idss
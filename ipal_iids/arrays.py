@@ -0,0 +1,146 @@
+import itertools
+import tempfile
+
+import numpy as np
+
+
+# Convert (a slice of) an array to Python lists and objects, e.g., for preprocessors
+def tolist(array):
+    if isinstance(array, np.ndarray):
+        return array.tolist()
+    return list(array)
+
+
+# Column of the events, which are either a matrix or a list of lists
+def column(events, index):
+    if isinstance(events, np.ndarray):
+        return events[:, index]
+    return [e[index] for e in events]
+
+
+# Integer codes of the values of a column given by their position in vals
+def encode(values, vals):
+    codes = {val: code for code, val in enumerate(vals)}
+
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        uniques, inverse = np.unique(values, return_inverse=True)
+        lookup = np.array([codes[val] for val in uniques.tolist()], dtype=np.int64)
+        return lookup[inverse.reshape(-1)]
+
+    return np.fromiter(
+        (codes[val] for val in values), dtype=np.int64, count=len(values)
+    )
+
+
+class GrowableArray:
+
+    # Append-only array of scalars or rows (rows=True) which doubles its capacity when
+    # full. Values are stored with the given dtype as long as all of them are of the
+    # matching Python types (float or int for float64, bool for bool), otherwise the
+    # array falls back to dtype object. Rows of differing lengths fall back to a list of
+    # lists. Appended values are collected in a small list and copied over in blocks.
+    #
+    # With a directory, typed values are stored in a memory-mapped temporary file in it
+    # instead of memory, such that the array may exceed the memory. The file is grown in
+    # place and removed once the array and all its views are released.
+    _types = {np.dtype(np.float64): {float, int}, np.dtype(bool): {bool}}
+    _block_size = 4096
+
+    def __init__(self, dtype=np.float64, rows=False, capacity=1024, directory=None):
+        self.dtype = np.dtype(dtype)
+        self.rows = rows
+        self.capacity = capacity
+        self.directory = directory
+        self.file = None
+        self.size = 0
+        self.width = None
+        self.data = None
+        self.ragged = None
+        self.pending = []
+
+    def __len__(self):
+        if self.ragged is not None:
+            return len(self.ragged) + len(self.pending)
+        return self.size + len(self.pending)
+
+    def _allocate(self, capacity):
+        shape = (capacity, self.width) if self.rows else (capacity,)
+        nbytes = int(np.prod(shape)) * self.dtype.itemsize
+
+        # Empty files cannot be mapped
+        if self.directory is not None and self.dtype != object and nbytes > 0:
+            if self.file is None:
+                self.file = tempfile.TemporaryFile(dir=self.directory)
+            self.file.truncate(nbytes)  # Keeps the values stored so far
+            self.data = np.memmap(self.file, dtype=self.dtype, mode="r+", shape=shape)
+            self.capacity = capacity
+            return
+
+        data = np.empty(shape, dtype=self.dtype)
+
+        if self.data is not None:
+            data[: self.size] = self.data[: self.size]
+        self.data = data
+        self.capacity = capacity
+
+    def _fits(self, values):
+        if self.dtype == object:
+            return True
+
+        if self.rows:
+            values = itertools.chain.from_iterable(values)
+        return set(map(type, values)) <= self._types[self.dtype]
+
+    def _flush(self):
+        values = self.pending
+        self.pending = []
+
+        if self.ragged is not None:
+            self.ragged += values
+            return
+
+        if self.data is None:
+            self.width = len(values[0]) if self.rows else None
+            self._allocate(max(self.capacity, len(values)))
+
+        if self.rows and set(map(len, values)) != {self.width}:
+            self.ragged = tolist(self.data[: self.size]) + values
+            self.data = None
+            self.file = None
+            return
+
+        if not self._fits(values):
+            self.dtype = np.dtype(object)
+            self.data = np.array(self.data, dtype=object)  # In memory
+            self.file = None
+
+        while self.size + len(values) > self.capacity:
+            self._allocate(2 * self.capacity)
+
+        if self.dtype == object:
+            # Assign one by one such that nested lists are kept as objects
+            for i, value in enumerate(values, start=self.size):
+                if self.rows:
+                    for j, v in enumerate(value):
+                        self.data[i, j] = v
+                else:
+                    self.data[i] = value
+        else:
+            self.data[self.size : self.size + len(values)] = values
+        self.size += len(values)
+
+    def append(self, value):
+        self.pending.append(value)
+        if len(self.pending) >= self._block_size:
+            self._flush()
+
+    # The values appended so far. Returns a view, i.e., without copying the data
+    def array(self):
+        if len(self.pending) > 0:
+            self._flush()
+
+        if self.ragged is not None:
+            return self.ragged
+        if self.data is None:
+            return np.empty((0, 0) if self.rows else (0,), dtype=self.dtype)
+        return self.data[: self.size]
@@ -0,0 +1,95 @@
+import queue
+import threading
+import time
+
+# Micro-batching of the live message stream. Messages are given as (is_ipal, msg)
+# tuples and grouped into batches of consecutive messages of the same format which
+# are yielded as (is_ipal, msgs).
+
+_END = object()  # Marks the end of the message stream
+
+
+# Collect up to batch_size messages and block until the batch is full
+def _fixed_batches(messages, batch_size):
+    batch = []
+    batch_is_ipal = None
+
+    for is_ipal, msg in messages:
+        # A batch only contains messages of one format
+        if len(batch) > 0 and batch_is_ipal != is_ipal:
+            yield batch_is_ipal, batch
+            batch = []
+
+        batch_is_ipal = is_ipal
+        batch.append(msg)
+
+        if len(batch) >= batch_size:
+            yield batch_is_ipal, batch
+            batch = []
+
+    if len(batch) > 0:
+        yield batch_is_ipal, batch
+
+
+# Read messages in a background thread such that waiting for input can time out. Each
+# message is queued together with the time it was read
+def _reader(messages, buffer):
+    try:
+        for item in messages:
+            buffer.put((time.monotonic(), item))
+    except BaseException as e:  # Forward errors to the consuming thread
+        buffer.put((None, (_END, e)))
+        return
+    buffer.put((None, (_END, None)))
+
+
+# Collect messages until either batch_size messages are available or max_wait seconds
+# passed since the first message of the batch was read, whichever comes first. Once
+# the first message waited max_wait seconds in the buffer, e.g., while the IDSs were
+# busy, only the messages available already are added
+def _timed_batches(messages, batch_size, max_wait):
+    buffer = queue.Queue(maxsize=2 * batch_size)
+    threading.Thread(target=_reader, args=(messages, buffer), daemon=True).start()
+
+    pending = None  # Message of another format which starts the next batch
+
+    while True:
+        if pending is None:
+            pending = buffer.get()  # Wait for the first message without timeout
+        arrival, item = pending
+        if item[0] is _END:
+            break
+
+        batch_is_ipal, msg = item
+        batch = [msg]
+        pending = None
+
+        deadline = arrival + max_wait
+        while len(batch) < batch_size:
+            timeout = deadline - time.monotonic()
+
+            try:
+                if timeout > 0:
+                    pending = buffer.get(timeout=timeout)
+                else:
+                    pending = buffer.get_nowait()
+            except queue.Empty:
+                break
+
+            is_ipal, msg = pending[1]
+            if is_ipal is _END or is_ipal != batch_is_ipal:
+                break
+            batch.append(msg)
+            pending = None
+
+        yield batch_is_ipal, batch
+
+    if item[1] is not None:  # Reader thread failed
+        raise item[1]
+
+
+def batches(messages, batch_size=1, max_wait=None):
+    if max_wait is None or batch_size <= 1:
+        return _fixed_batches(messages, batch_size)
+    else:
+        return _timed_batches(messages, batch_size, max_wait)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import ipal_iids.dataset as dataset
+import ipal_iids.settings as settings
+
+# Cache of features extracted from training files (see --train.cache). Each entry is
+# stored as one .npy file per array. Numeric arrays are memory-mapped on loading, object
+# arrays, e.g., with strings or None, are stored pickled.
+_arrays = ["events", "annotations", "timestamps"]
+
+
+# Key of a cache entry derived from the content of the training file and the
+# parameters affecting the extraction. Returns None if the input cannot be cached
+def key(filename, params):
+    filename = str(filename)
+    if settings.train_cache is None or filename == "-":
+        return None
+
+    fingerprint = json.dumps([dataset.content_hash(filename), params], sort_keys=True)
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+
+
+def _path(key, name):
+    return os.path.join(settings.train_cache, "{}.{}.npy".format(key, name))
+
+
+def _load_array(path):
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:  # Object arrays cannot be memory-mapped
+        return np.load(path, allow_pickle=True)
+
+
+# Returns (events, annotations, timestamps) as arrays or None if not cached
+def load(key):
+    if key is None or settings.train_cache is None:
+        return None
+
+    paths = [_path(key, name) for name in _arrays]
+    if not all(os.path.isfile(path) for path in paths):
+        return None
+
+    settings.logger.info("Loading features from cache {}".format(key))
+    return tuple(_load_array(path) for path in paths)
+
+
+def save(key, events, annotations, timestamps):
+    if key is None or settings.train_cache is None:
+        return
+
+    arrays = [events, annotations, timestamps]
+    if not all(isinstance(array, np.ndarray) for array in arrays):
+        settings.logger.info("Features of differing lengths are not cached")
+        return
+
+    for name, array in zip(_arrays, arrays):
+        # Write atomically such that concurrent runs never read partial files
+        tmp = _path(key, "{}.{}".format(name, os.getpid()))
+        with open(tmp, "wb") as f:
+            np.save(f, array, allow_pickle=array.dtype == object)
+        os.replace(tmp, _path(key, name))
+
+    settings.logger.info("Saved features to cache {}".format(key))
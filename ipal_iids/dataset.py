@@ -0,0 +1,95 @@
+import hashlib
+import json
+import time
+
+import ipal_iids.settings as settings
+
+from ipal_iids.fields import FieldDecoder
+from ipal_iids.files import open_file
+
+# Training files are parsed only once and shared by all IDSs training on them. Each
+# file is decoded to the union of the fields accessed by these IDSs. Files used by a
+# single IDS only, or all files with --train.spill, are streamed instead of being kept
+# in memory.
+_fields = {}  # filename -> list of required fields or None for whole messages
+_consumers = {}  # filename -> number of IDSs training on the file
+_datasets = {}  # filename -> list of decoded messages
+_hashes = {}  # filename -> hash of the file content
+
+
+# Announce the fields an IDS accesses in a training file. Has to be called before the
+# file is loaded, None requires the whole messages
+def require(filename, fields):
+    filename = str(filename)
+    _consumers[filename] = _consumers.get(filename, 0) + 1
+
+    if fields is None or _fields.get(filename, []) is None:
+        _fields[filename] = None
+    else:
+        _fields[filename] = _fields.get(filename, []) + fields
+
+
+def _parse(filename):
+    fields = _fields.get(filename, None)
+    decode = json.loads
+    if fields is not None:
+        decode = FieldDecoder(fields, prune=True).decode
+
+    with open_file(filename, "rt") as f:
+        for line in f:
+            yield decode(line)
+
+
+def _shared(filename):
+    return _consumers.get(filename, 0) > 1 and settings.train_spill is None
+
+
+# Messages of a training file. The file is parsed on first access only
+def load(filename):
+    filename = str(filename)
+
+    if filename not in _datasets and not _shared(filename):
+        return _parse(filename)
+
+    if filename not in _datasets:
+        start = time.time()
+        settings.logger.info("Parsing training file {}".format(filename))
+
+        _datasets[filename] = list(_parse(filename))
+
+        settings.logger.info(
+            "Parsed {} messages in {}s".format(
+                len(_datasets[filename]), time.time() - start
+            )
+        )
+
+    return _datasets[filename]
+
+
+# Parse all files shared by several IDSs, e.g., before forking worker processes
+def preload():
+    for filename in list(_consumers):
+        if _shared(filename):
+            load(filename)
+
+
+# Hash of the raw content of a training file, e.g., to identify cached results
+def content_hash(filename):
+    filename = str(filename)
+
+    if filename not in _hashes:
+        h = hashlib.sha1()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        _hashes[filename] = h.hexdigest()
+
+    return _hashes[filename]
+
+
+# Release all parsed training files, e.g., once training is done
+def clear():
+    _fields.clear()
+    _consumers.clear()
+    _datasets.clear()
+    _hashes.clear()
@@ -0,0 +1,98 @@
+import json
+
+import ipal_iids.settings as settings
+
+# pysimdjson is optional. It allows to only decode the accessed parts of a message.
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+# Combine lists of fields, each given as a list of keys leading to it, into a tree of
+# nested dicts. A subtree of None selects the whole value.
+def merge_fields(fields):
+    tree = {}
+
+    for field in fields:
+        node = tree
+        for i, key in enumerate(field):
+            if i == len(field) - 1:
+                node[key] = None  # Whole value required
+                break
+
+            if key in node and node[key] is None:  # Whole value already required
+                break
+            node = node.setdefault(key, {})
+
+    return tree
+
+
+class FieldDecoder:
+
+    # Decodes only the given fields of a JSON message. Requires pysimdjson and falls
+    # back to decoding the whole message otherwise or if the line is no valid JSON
+    # for simdjson, e.g., if it contains NaN. With prune, fully decoded messages are
+    # reduced to the given fields as well, e.g., to keep many messages in memory.
+    def __init__(self, fields, prune=False):
+        self.tree = merge_fields(fields)
+        self.prune = prune
+        self.parser = simdjson.Parser() if simdjson is not None else None
+
+        if self.parser is None:
+            settings.logger.info("pysimdjson not installed, decoding full messages")
+
+    def _to_python(self, value):
+        if isinstance(value, simdjson.Object):
+            return value.as_dict()
+        elif isinstance(value, simdjson.Array):
+            return value.as_list()
+        return value
+
+    def _extract(self, obj, tree):
+        out = {}
+
+        for key, subtree in tree.items():
+            try:
+                value = obj[key]
+            except KeyError:  # Missing fields are handled by the IDSs
+                continue
+
+            if subtree is not None and isinstance(value, simdjson.Object):
+                out[key] = self._extract(value, subtree)
+            else:
+                out[key] = self._to_python(value)
+
+        return out
+
+    def _prune(self, obj, tree):
+        out = {}
+
+        for key, subtree in tree.items():
+            if key not in obj:
+                continue
+
+            if subtree is not None and isinstance(obj[key], dict):
+                out[key] = self._prune(obj[key], subtree)
+            else:
+                out[key] = obj[key]
+
+        return out
+
+    def _decode(self, line):
+        return self._extract(self.parser.parse(line), self.tree)
+
+    def _decode_full(self, line):
+        msg = json.loads(line)
+        if self.prune and isinstance(msg, dict):
+            return self._prune(msg, self.tree)
+        return msg
+
+    def decode(self, line):
+        if self.parser is None:
+            return self._decode_full(line)
+
+        try:
+            return self._decode(line)
+        except ValueError:
+            return self._decode_full(line)
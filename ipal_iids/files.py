@@ -0,0 +1,19 @@
+import gzip
+import sys
+
+import ipal_iids.settings as settings
+
+
+# Open a file hiding compression ('*.gz') and '-' for stdin or stdout. Files are block
+# buffered, e.g., flushing the live output is up to the OutputWriter
+def open_file(filename, mode="r"):
+    if filename is None:
+        return None
+
+    filename = str(filename)
+    if filename == "-":
+        return sys.stdout if "w" in mode or "a" in mode else sys.stdin
+    elif filename.endswith(".gz"):
+        return gzip.open(filename, mode=mode, compresslevel=settings.compresslevel)
+    else:
+        return open(filename, mode=mode)
@@ -1,27 +1,32 @@
 #!/usr/bin/env python3
 import argparse
-import gzip
+import glob
 import json
 import logging
+import multiprocessing
 import os
+import pickle
+import shutil
+import signal
 import sys
+import tempfile
 import time
 
 from pathlib import Path
 
+import ipal_iids.dataset as dataset
+import ipal_iids.profiling as profiling
 import ipal_iids.settings as settings
+import ipal_iids.stats as stats
 
+from ipal_iids.batching import batches
+from ipal_iids.fields import FieldDecoder
+from ipal_iids.files import open_file
+from ipal_iids.inputs import merge
+from ipal_iids.output import OutputWriter, splice_fields
 from ids.utils import get_all_iidss
 
 
-# Wrapper for hiding .gz files
-def open_file(filename, mode):
-    if filename.endswith(".gz"):
-        return gzip.open(filename, mode=mode, compresslevel=settings.compresslevel)
-    else:
-        return open(filename, mode=mode, buffering=1)
-
-
 # Initialize logger
 def initialize_logger(args):
 
@@ -46,7 +51,10 @@ def initialize_logger(args):
 def dump_ids_default_config(name):
     if name not in settings.idss:
         settings.logger.error("IDS {} not found! Use one of:".format(name))
-        settings.logger.error(", ".join(settings.idss.keys()))
+        for ids in settings.idss.keys():
+            settings.logger.error(
+                "{}: {}".format(ids, get_all_iidss().metadata(ids)["description"])
+            )
         exit(1)
 
     # Create IDSs default config
@@ -80,18 +88,44 @@ def prepare_arg_parser(parser):
         help="input file of IPAL state messages to train the IDS on ('-' stdin, '*.gz' compressed).",
         required=False,
     )
+    parser.add_argument(
+        "--train.cache",
+        dest="train_cache",
+        metavar="DIR",
+        help="cache the features extracted from the training files in this directory and reuse them in later runs on the same files.",
+        required=False,
+    )
+    parser.add_argument(
+        "--train.spill",
+        dest="train_spill",
+        metavar="DIR",
+        help="store the features extracted from the training files in temporary memory-mapped files in this directory instead of the memory, e.g., to train on datasets exceeding the memory. Training files are then parsed by each IDS separately instead of once.",
+        required=False,
+    )
     parser.add_argument(
         "--live.ipal",
         dest="live_ipal",
         metavar="FILE",
-        help="input file of IPAL messages to perform the live detection on ('-' stdin, '*.gz' compressed).",
+        nargs="+",
+        action="extend",
+        help="input file(s) of IPAL messages to perform the live detection on ('-' stdin, '*.gz' compressed, glob patterns allowed). Multiple inputs are merged by timestamp.",
         required=False,
     )
     parser.add_argument(
         "--live.state",
         dest="live_state",
         metavar="FILE",
-        help="input file of IPAL state messages to perform the live detection on ('-' stdin, '*.gz' compressed).",
+        nargs="+",
+        action="extend",
+        help="input file(s) of IPAL state messages to perform the live detection on ('-' stdin, '*.gz' compressed, glob patterns allowed). Multiple inputs are merged by timestamp.",
+        required=False,
+    )
+    parser.add_argument(
+        "--live.reorder",
+        dest="live_reorder",
+        metavar="INT",
+        default=0,
+        help="number of messages buffered per live input to restore the order of slightly out-of-order timestamps. (Default: 0)",
         required=False,
     )
     parser.add_argument(
@@ -101,6 +135,36 @@ def prepare_arg_parser(parser):
         help="output file to write the anotated IDS output to (Default:none, '-' stdout, '*,gz' compress).",
         required=False,
     )
+    parser.add_argument(
+        "--output.buffer",
+        dest="output_buffer",
+        metavar="BYTES",
+        default=65536,
+        help="write the output in chunks of this size, 0 writes every batch immediately. (Default: 65536)",
+        required=False,
+    )
+    parser.add_argument(
+        "--output.flush-interval",
+        dest="output_flush_interval",
+        metavar="SEC",
+        default=1.0,
+        help="write buffered output at least every SEC seconds, 0 disables the periodic flush. (Default: 1.0)",
+        required=False,
+    )
+    parser.add_argument(
+        "--output.flush-on-alert",
+        dest="output_flush_on_alert",
+        help="write buffered output immediately after an alert was emitted.",
+        action="store_true",
+        required=False,
+    )
+    parser.add_argument(
+        "--output.passthrough",
+        dest="output_passthrough",
+        help="copy the input lines to the output as they are and only append the fields added by the IDSs instead of re-encoding each message.",
+        action="store_true",
+        required=False,
+    )
     parser.add_argument(
         "--config",
         dest="config",
@@ -120,6 +184,78 @@ def prepare_arg_parser(parser):
         required=False,
     )
 
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        metavar="INT",
+        default=1,
+        help="number of consecutive live messages handed to the IDSs at once. IDSs supporting it classify a batch with a single call. (Default: 1)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--batch-wait",
+        dest="batch_wait",
+        metavar="MS",
+        default=None,
+        help="maximum time in milliseconds to wait for further live messages before an incomplete batch is handed to the IDSs. Without it, batches are only handed over once full. (Default: none)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--train-jobs",
+        dest="train_jobs",
+        metavar="INT",
+        default=1,
+        help="number of IDSs trained in parallel processes. (Default: 1)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        metavar="FILE",
+        default=None,
+        help="write statistics of the live phase as JSON to FILE, i.e., per IDS latency percentiles, messages per second and alerts as well as the time spent reading input, preprocessing and writing output. (Default: none)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--stats.interval",
+        dest="stats_interval",
+        metavar="SEC",
+        default=10.0,
+        help="rewrite the statistics file every SEC seconds and at exit. (Default: 10.0)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--stats.sample",
+        dest="stats_sample",
+        metavar="INT",
+        default=64,
+        help="time one batch every INT messages for the statistics, 1 times all batches. Messages and alerts are always counted. (Default: 64)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--profile",
+        dest="profile",
+        metavar="DIR",
+        default=None,
+        help="profile training, loading and saving models, and the live phase separately per IDS and write the profiles to DIR as pstats files and collapsed stacks for flame graphs. (Default: none)",
+        required=False,
+    )
+
+    parser.add_argument(
+        "--profile.interval",
+        dest="profile_interval",
+        metavar="MS",
+        default=None,
+        help="sample the stack every MS milliseconds during the live phase instead of profiling each call, e.g., for long live runs. (Default: none)",
+        required=False,
+    )
+
     parser.add_argument(
         "--retrain",
         dest="retrain",
@@ -166,6 +302,29 @@ def parse_ids_arguments(args):
     return idss
 
 
+# Keep a single input as plain string such that the configuration stays unchanged
+def _single_or_list(inputs):
+    return inputs[0] if len(inputs) == 1 else inputs
+
+
+# Open all live inputs. Each input is a file, '-' for stdin, or a glob pattern
+def open_live_inputs(inputs):
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    fds = []
+    for name in inputs:
+        if name in ["-", "stdin", "stdout"]:
+            fds.append(sys.stdin)
+            continue
+
+        # Patterns without matches are opened as is to report the missing file
+        for filename in sorted(glob.glob(name)) or [name]:
+            fds.append(open_file(filename, "rt"))
+
+    return fds
+
+
 def load_settings(args):  # noqa: C901
 
     if args.defaultconfig:
@@ -197,24 +356,111 @@ def load_settings(args):  # noqa: C901
         settings.train_ipal = args.train_ipal
     if args.train_state:
         settings.train_state = args.train_state
+    if args.train_cache:
+        settings.train_cache = args.train_cache
+        os.makedirs(settings.train_cache, exist_ok=True)
+    if args.train_spill:
+        settings.train_spill = args.train_spill
+        os.makedirs(settings.train_spill, exist_ok=True)
 
     # Parse live ipal input
     if args.live_ipal:
-        settings.live_ipal = args.live_ipal
+        settings.live_ipal = _single_or_list(args.live_ipal)
     if settings.live_ipal:
-        if settings.live_ipal != "stdout" and settings.live_ipal != "-":
-            settings.live_ipalfd = open_file(settings.live_ipal, "r")
-        else:
-            settings.live_ipalfd = sys.stdin
+        settings.live_ipalfds = open_live_inputs(settings.live_ipal)
 
     # Parse live state input
     if args.live_state:
-        settings.live_state = args.live_state
+        settings.live_state = _single_or_list(args.live_state)
     if settings.live_state:
-        if settings.live_state != "stdin" and settings.live_state != "-":
-            settings.live_statefd = open_file(settings.live_state, "r")
-        else:
-            settings.live_statefd = sys.stdin
+        settings.live_statefds = open_live_inputs(settings.live_state)
+
+    # Parse live reorder window
+    if args.live_reorder:
+        try:
+            settings.live_reorder = int(args.live_reorder)
+        except ValueError:
+            settings.logger.error(
+                "Option '--live.reorder' must be a non-negative integer"
+            )
+            exit(1)
+
+        if settings.live_reorder < 0:
+            settings.logger.error(
+                "Option '--live.reorder' must be a non-negative integer"
+            )
+            exit(1)
+
+    # Parse live batch size
+    if args.batch_size:
+        try:
+            settings.batch_size = int(args.batch_size)
+        except ValueError:
+            settings.logger.error("Option '--batch-size' must be a positive integer")
+            exit(1)
+
+        if settings.batch_size < 1:
+            settings.logger.error("Option '--batch-size' must be a positive integer")
+            exit(1)
+
+    # Parse maximum live batch latency
+    if args.batch_wait is not None:
+        try:
+            settings.batch_wait = float(args.batch_wait)
+        except ValueError:
+            settings.logger.error("Option '--batch-wait' must be a number")
+            exit(1)
+
+        if settings.batch_wait < 0:
+            settings.logger.error("Option '--batch-wait' must not be negative")
+            exit(1)
+
+    # Parse number of parallel training processes
+    if args.train_jobs:
+        try:
+            settings.train_jobs = int(args.train_jobs)
+        except ValueError:
+            settings.logger.error("Option '--train-jobs' must be a positive integer")
+            exit(1)
+
+        if settings.train_jobs < 1:
+            settings.logger.error("Option '--train-jobs' must be a positive integer")
+            exit(1)
+
+    # Parse live statistics
+    if args.stats:
+        settings.stats = args.stats
+        try:
+            settings.stats_interval = float(args.stats_interval)
+        except ValueError:
+            settings.logger.error("Option '--stats.interval' must be a number")
+            exit(1)
+
+        try:
+            settings.stats_sample = int(args.stats_sample)
+        except ValueError:
+            settings.logger.error("Option '--stats.sample' must be a positive integer")
+            exit(1)
+
+        if settings.stats_sample < 1:
+            settings.logger.error("Option '--stats.sample' must be a positive integer")
+            exit(1)
+
+    # Parse profiling
+    if args.profile:
+        settings.profile = args.profile
+        os.makedirs(settings.profile, exist_ok=True)
+
+        if args.profile_interval is not None:
+            try:
+                settings.profile_interval = float(args.profile_interval)
+            except ValueError:
+                settings.logger.error("Option '--profile.interval' must be a number")
+                exit(1)
+
+            if settings.profile_interval <= 0:
+                settings.logger.error("Option '--profile.interval' must be positive")
+                exit(1)
 
     # Parse retrain
     if args.retrain:
@@ -232,6 +478,17 @@ def load_settings(args):  # noqa: C901
         else:
             settings.outputfd = sys.stdout
 
+        try:
+            settings.output_buffer = int(args.output_buffer)
+            settings.output_flush_interval = float(args.output_flush_interval)
+        except ValueError:
+            settings.logger.error(
+                "Options '--output.buffer' and '--output.flush-interval' must be numbers"
+            )
+            exit(1)
+        settings.output_flush_on_alert = args.output_flush_on_alert
+        settings.output_passthrough = args.output_passthrough
+
     # Parse config
     settings.config = args.config
 
@@ -249,6 +506,184 @@ def load_settings(args):  # noqa: C901
         exit(1)
 
 
+# Start buffering the output. The OutputWriter flushes from a background thread, hence
+# it is started after training such that no thread runs while training processes fork
+def start_output():
+    if settings.output:
+        settings.outputwriter = OutputWriter(
+            settings.outputfd,
+            buffer_size=settings.output_buffer,
+            flush_interval=settings.output_flush_interval,
+            flush_on_alert=settings.output_flush_on_alert,
+        )
+
+
+# Close the output writing all buffered output
+def close_output():
+    if not settings.output:
+        return
+
+    close_fd = settings.outputfd != sys.stdout
+    if settings.outputwriter is not None:
+        settings.outputwriter.close(close_fd=close_fd)
+    elif close_fd:
+        settings.outputfd.close()
+
+
+# Training file an IDS reads. As in the IDSs' train methods, state messages take
+# precedence over IPAL messages if both are given
+def training_file(ids):
+    if ids.requires("train.state") and settings.train_state:
+        return settings.train_state
+    if ids.requires("train.ipal") and settings.train_ipal:
+        return settings.train_ipal
+    return None
+
+
+# Announce the fields accessed by the IDSs such that each training file is parsed only
+# once and only as far as required
+def require_training_fields(idss):
+    for ids in idss:
+        filename = training_file(ids)
+        if filename is not None:
+            dataset.require(filename, ids.requires_fields())
+
+
+# Train a single IDS on the training files
+def _train_ids(ids):
+    start = time.time()
+    settings.logger.info("Training of {} started at {}".format(ids._name, start))
+
+    with profiling.profile("train", ids._name):
+        ids.train(ipal=settings.train_ipal, state=settings.train_state)
+
+    end = time.time()
+    settings.logger.info(
+        "Training of {} ended at {} ({}s)".format(ids._name, end, end - start)
+    )
+
+
+# Try to save the trained model
+def _save_ids(ids):
+    try:
+        with profiling.profile("save", ids._name):
+            saved = ids.save_trained_model()
+        if saved:
+            settings.logger.info("Saved trained model of {} to file.".format(ids._name))
+    except NotImplementedError:
+        settings.logger.info(
+            "Saving model to file not implemented for {}.".format(ids._name)
+        )
+
+
+# IDSs trained by the worker processes. Set before forking such that the workers inherit
+# them together with the parsed training files
+_pool_idss = []
+
+
+# Save a trained IDS, which cannot be pickled, to a temporary model file in the format of
+# the IDS. Returns the directory of the model file or None if saving is not supported
+def _save_temporary(ids):
+    directory = tempfile.mkdtemp(prefix="ipal-iids-")
+    model_file = ids.settings["model-file"]
+    ids.settings["model-file"] = os.path.join(directory, "model")
+
+    try:
+        saved = ids.save_trained_model()
+    except NotImplementedError:
+        saved = False
+    finally:
+        ids.settings["model-file"] = model_file
+
+    if not saved:
+        shutil.rmtree(directory)
+        return None
+    return directory
+
+
+# Load a model saved by _save_temporary and remove it
+def _load_temporary(ids, directory):
+    model_file = ids.settings["model-file"]
+    ids.settings["model-file"] = os.path.join(directory, "model")
+
+    try:
+        loaded = ids.load_trained_model()
+    finally:
+        shutil.rmtree(directory)
+    ids.settings["model-file"] = model_file  # Loading may replace the settings
+
+    return loaded
+
+
+def _train_worker(index):
+    ids = _pool_idss[index]
+
+    try:
+        _train_ids(ids)
+    except SystemExit as e:  # Do not kill the worker, the pool would wait forever
+        return "exit", e.code
+
+    profiling.write("train", ids._name)  # The profile is not transferred back
+
+    try:
+        return "trained", pickle.dumps(ids)
+    except Exception as e:  # e.g., models holding resources which cannot be pickled
+        settings.logger.info(
+            "Cannot pickle trained {}, transferring its model file: {}".format(
+                ids._name, e
+            )
+        )
+
+    directory = _save_temporary(ids)
+    if directory is None:
+        return "retry", None
+    return "saved", directory
+
+
+# Train the IDSs in a pool of --train-jobs forked processes and return the trained IDSs
+# in the same order. IDSs which can neither be pickled nor saved to a model file are
+# trained sequentially again
+def train_parallel(idss):
+    global _pool_idss
+
+    try:
+        context = multiprocessing.get_context("fork")
+    except ValueError:
+        settings.logger.warning("Forking not supported, training sequentially")
+        for ids in idss:
+            _train_ids(ids)
+        return idss
+
+    dataset.preload()  # Parse shared training files once before forking
+    _pool_idss = idss
+    # Workers do not flush any output and are terminated through SIGTERM
+    with context.Pool(
+        min(settings.train_jobs, len(idss)),
+        initializer=signal.signal,
+        initargs=(signal.SIGTERM, signal.SIG_DFL),
+    ) as pool:
+        results = pool.map(_train_worker, range(len(idss)), chunksize=1)
+    _pool_idss = []
+
+    trained = []
+    for ids, (status, payload) in zip(idss, results):
+        if status == "exit":
+            exit(payload)
+
+        if status == "trained":
+            ids = pickle.loads(payload)
+        elif status != "saved" or not _load_temporary(ids, payload):
+            settings.logger.warning(
+                "Cannot transfer trained {}, training it again".format(ids._name)
+            )
+            _train_ids(ids)
+        settings.idss[ids._name] = ids.settings  # Keep the configuration in sync
+
+        trained.append(ids)
+
+    return trained
+
+
 def train_idss(idss):
     # Try to load an existing model from file
     loaded_from_file = []
@@ -257,7 +692,9 @@ def train_idss(idss):
             continue
 
         try:
-            if ids.load_trained_model():
+            with profiling.profile("load", ids._name):
+                loaded = ids.load_trained_model()
+            if loaded:
                 loaded_from_file.append(ids)
                 settings.logger.info(
                     "IDS {} loaded a saved model successfully.".format(ids._name)
@@ -281,106 +718,155 @@ def train_idss(idss):
         )
         exit(1)
 
+    require_training_fields([ids for ids in idss if ids not in loaded_from_file])
+
     # Give the various IDSs the dataset they need in their learning phase
+    indices = [i for i, ids in enumerate(idss) if ids not in loaded_from_file]
+    if settings.train_jobs > 1 and len(indices) > 1:
+        trained = train_parallel([idss[i] for i in indices])
+        for i, ids in zip(indices, trained):
+            idss[i] = ids
+            _save_ids(ids)
+    else:
+        for i in indices:
+            _train_ids(idss[i])
+            _save_ids(idss[i])
+
+    dataset.clear()  # Free the parsed training files before going live
+
+
+# Read all messages of a live input as (is_ipal, (line, msg))
+def _read_msgs(fd, is_ipal, decode):
+    for line in fd:
+        yield is_ipal, (line, decode(line))
+
+
+def _timestamp(item):
+    return item[1][1]["timestamp"]
+
+
+# Decode only the message fields accessed by the IDSs if the output does not require the
+# whole message, i.e., if there is no output or it is written in pass-through mode
+def _live_decoder(idss):
+    if settings.output and not settings.output_passthrough:
+        return json.loads
+
+    fields = [["timestamp"]]  # Required to order the messages
     for ids in idss:
-        if ids in loaded_from_file:
-            continue
+        ids_fields = ids.requires_fields()
+        if ids_fields is None:
+            return json.loads
+        fields += ids_fields
 
-        start = time.time()
-        settings.logger.info("Training of {} started at {}".format(ids._name, start))
+    return FieldDecoder(fields).decode
 
-        ids.train(ipal=settings.train_ipal, state=settings.train_state)
 
-        end = time.time()
-        settings.logger.info(
-            "Training of {} ended at {} ({}s)".format(ids._name, end, end - start)
-        )
+# Yield all live messages as (is_ipal, (line, msg)) in the order they have to be processed
+def _live_msgs(decode):
+    # State inputs come first such that they are processed before IPAL messages with
+    # the same timestamp
+    streams = []
+    if settings.live_state:
+        streams += [_read_msgs(fd, False, decode) for fd in settings.live_statefds]
+    if settings.live_ipal:
+        streams += [_read_msgs(fd, True, decode) for fd in settings.live_ipalfds]
 
-        # Try to save the trained model
-        try:
-            if ids.save_trained_model():
-                settings.logger.info(
-                    "Saved trained model of {} to file.".format(ids._name)
-                )
-        except NotImplementedError:
-            settings.logger.info(
-                "Saving model to file not implemented for {}.".format(ids._name)
-            )
+    if len(streams) == 0:
+        return iter([])
+
+    return merge(streams, _timestamp, window=settings.live_reorder)
+
+
+# Run an IDS on a batch of messages, profiled if required
+def _run_ids(ids, process, msgs):
+    if settings.profile is None or profiling.sampled("live"):
+        return process(msgs)
+    return profiling.run("live", ids._name, process, msgs)
+
+
+# Run all IDSs on a batch of messages of the same format and annotate the results
+def _process_batch(idss, is_ipal, msgs):
+    for msg in msgs:
+        msg["metrics"] = {}
+        msg["ids"] = False
+
+    for ids in idss:
+        if is_ipal and ids.requires("live.ipal"):
+            process = ids.new_ipal_msgs
+        elif not is_ipal and ids.requires("live.state"):
+            process = ids.new_state_msgs
+        else:
+            continue
+
+        if stats.timing:  # Sampled batch, time the IDS and its preprocessing
+            with stats.timed_preprocessing(ids):
+                start = time.perf_counter_ns()
+                results = _run_ids(ids, process, msgs)
+                stats.add_ids(ids._name, time.perf_counter_ns() - start, len(msgs))
+        else:
+            results = _run_ids(ids, process, msgs)
+
+        if settings.stats is not None:
+            stats.count_ids(ids._name, results)
+
+        assert len(results) == len(msgs)
+        for msg, (alert, metric) in zip(msgs, results):
+            msg["ids"] = msg["ids"] or alert  # combine alerts with or (TODO config ?)
+            msg["metrics"][ids._name] = metric
 
 
 def live_idss(idss):
-    # Keep track of the last state and message information. Then we are capable of delivering them in the right order.
-    ipal_msg = None
-    state_msg = None
     _first_ipal_msg = True
     _first_state_msg = True
 
-    while True:
-        # load a new ipal message
-        if ipal_msg is None and settings.live_ipal:
-            line = settings.live_ipalfd.readline()
-            if line:
-                ipal_msg = json.loads(line)
-
-        # load a new state
-        if state_msg is None and settings.live_state:
-            line = settings.live_statefd.readline()
-            if line:
-                state_msg = json.loads(line)
-
-        # Determine smallest timestamp ipal or state?
-        if ipal_msg and state_msg:
-            is_ipal_smaller = ipal_msg.timestamp < state_msg.timestamp
-        elif ipal_msg:
-            is_ipal_smaller = True
-        elif state_msg:
-            is_ipal_smaller = False
-        else:  # handled all messages from files
-            break
-
-        # Process next message
-        if is_ipal_smaller:
-            ipal_msg["metrics"] = {}
-            ipal_msg["ids"] = False
-
-            for ids in idss:
-                if ids.requires("live.ipal"):
-                    alert, metric = ids.new_ipal_msg(ipal_msg)
-                    ipal_msg["ids"] = (
-                        ipal_msg["ids"] or alert
-                    )  # combine alerts with or (TODO config ?)
-                    ipal_msg["metrics"][ids._name] = metric
-
-            if settings.output:
-
-                if _first_ipal_msg:
-                    ipal_msg["_iids-config"] = settings.iids_settings_to_dict()
-                    _first_ipal_msg = False
-
-                settings.outputfd.write(json.dumps(ipal_msg) + "\n")
-                settings.outputfd.flush()
-            ipal_msg = None
-        else:
-            state_msg["metrics"] = {}
-            state_msg["ids"] = False
+    max_wait = None
+    if settings.batch_wait is not None:
+        max_wait = settings.batch_wait / 1000
+
+    if settings.stats is not None:
+        stats.start()
+
+    messages = _live_msgs(_live_decoder(idss))
+    for is_ipal, batch in batches(messages, settings.batch_size, max_wait):
+        timed = settings.stats is not None and stats.sample(batch)
+        if timed:
+            start = time.perf_counter_ns()
+
+        lines = [line for line, _ in batch]
+        msgs = [msg for _, msg in batch]
+
+        _process_batch(idss, is_ipal, msgs)
+
+        if timed:
+            output_start = time.perf_counter_ns()
+
+        if settings.output:
+            if is_ipal and _first_ipal_msg:
+                msgs[0]["_iids-config"] = settings.iids_settings_to_dict()
+                _first_ipal_msg = False
+            elif not is_ipal and _first_state_msg:
+                msgs[0]["_iids-config"] = settings.iids_settings_to_dict()
+                _first_state_msg = False
 
-            for ids in idss:
-                if ids.requires("live.state"):
-                    alert, metric = ids.new_state_msg(state_msg)
-                    state_msg["ids"] = (
-                        state_msg["ids"] or alert
-                    )  # combine alerts with or (TODO config ?)
-                    state_msg["metrics"][ids._name] = metric
+            if settings.output_passthrough:  # Keep the input lines as they are
+                out = "".join(
+                    splice_fields(line, msg) for line, msg in zip(lines, msgs)
+                )
+            else:
+                out = "".join(json.dumps(msg) + "\n" for msg in msgs)
+
+            settings.outputwriter.write(out, alert=any(msg["ids"] for msg in msgs))
 
-            if settings.output:
+        if settings.stats is not None:
+            stats.count_alerts(msgs)
+        if timed:
+            stats.add_batch(msgs, start, output_start)
 
-                if _first_state_msg:
-                    state_msg["_iids-config"] = settings.iids_settings_to_dict()
-                    _first_state_msg = False
 
-                settings.outputfd.write(json.dumps(state_msg) + "\n")
-                settings.outputfd.flush()
-            state_msg = None
+# Terminate gracefully such that buffered output is not lost
+def _terminate(signum, frame):
+    settings.logger.info("Received signal {}, exiting".format(signum))
+    sys.exit(128 + signum)
 
 
 def main():
@@ -392,25 +878,34 @@ def main():
     load_settings(args)
     idss = parse_ids_arguments(args)
 
+    signal.signal(signal.SIGTERM, _terminate)
+
     try:
         # Train IDSs
         settings.logger.info("Start IDS training...")
-        train_idss(idss)
+        with profiling.profile("train"):
+            train_idss(idss)
 
         # Live IDS
         settings.logger.info("Start IDS live...")
-        live_idss(idss)
+        start_output()
+        with profiling.profile("live"):
+            live_idss(idss)
     except BrokenPipeError:
         devnull = os.open(os.devnull, os.O_WRONLY)
         os.dup2(devnull, sys.stdout.fileno())
-
-    # Finalize and close
-    if settings.output and settings.outputfd != sys.stdout:
-        settings.outputfd.close()
-    if settings.live_ipal:
-        settings.live_ipalfd.close()
-    if settings.live_state:
-        settings.live_statefd.close()
+    finally:
+        # Finalize and close
+        if settings.stats is not None:
+            stats.dump()
+        profiling.write()
+        close_output()
+        if settings.live_ipal:
+            for fd in settings.live_ipalfds:
+                fd.close()
+        if settings.live_state:
+            for fd in settings.live_statefds:
+                fd.close()
 
 
 if __name__ == "__main__":
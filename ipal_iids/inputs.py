@@ -0,0 +1,49 @@
+import heapq
+import itertools
+
+import ipal_iids.settings as settings
+
+
+# Restore the order of a slightly out-of-order stream. Up to window items are buffered
+# and the one with the smallest key is emitted once the buffer is full.
+def reorder(stream, key, window):
+    buffer = []
+    counter = itertools.count()  # Keeps items with equal keys in their original order
+    last = None
+    warned = False
+
+    def emit():
+        nonlocal last, warned
+        k, _, item = heapq.heappop(buffer)
+
+        if last is not None and k < last and not warned:
+            settings.logger.warning(
+                "Input is out of order by more than {} messages, consider increasing the reorder window (further occurrences are not reported)".format(
+                    window
+                )
+            )
+            warned = True
+
+        last = k
+        return item
+
+    for item in stream:
+        heapq.heappush(buffer, (key(item), next(counter), item))
+        if len(buffer) > window:
+            yield emit()
+
+    while len(buffer) > 0:
+        yield emit()
+
+
+# Merge any number of streams, each ordered by key, into a single ordered stream. Only
+# one item per stream (plus the reorder window) is kept in memory. Items with equal
+# keys are emitted in the order of the streams.
+def merge(streams, key, window=0):
+    if window > 0:
+        streams = [reorder(stream, key, window) for stream in streams]
+
+    if len(streams) == 1:
+        return iter(streams[0])
+
+    return heapq.merge(*streams, key=key)
@@ -0,0 +1,218 @@
+import gzip
+import json
+import os
+import struct
+
+import numpy as np
+
+# Binary container for trained models, used for model files ending with .bin or .bin.gz.
+# The file starts with a magic string, the format version, and the length of a JSON
+# header, which holds the model with all arrays replaced by references. The arrays
+# follow aligned to 64 bytes. Besides numpy arrays, homogeneous lists of numbers and
+# tables, i.e., dicts with numbers as keys and numbers or equally long lists of numbers
+# as values (each may be None), are stored as arrays. On loading, these are converted
+# back in bulk such that a model is restored with the same types, e.g., number instead
+# of string keys as in JSON. This is much faster than decoding a JSON model, yet the
+# restored model is made of Python objects, only numpy arrays refer to the file buffer.
+MAGIC = b"IPALMODL"
+VERSION = 1
+
+# Keys marking encoded values in the header. Dicts using them as keys are stored as
+# pairs of keys and values, such that they are not mistaken for encoded values
+_markers = {"__array__", "__list__", "__table__", "__dict__"}
+
+_prelude = struct.Struct("<8sIQ")  # magic, version, header length
+_alignment = 64
+
+
+def is_binary(filename):
+    return str(filename).endswith((".bin", ".bin.gz"))
+
+
+def _kind(t):
+    if issubclass(t, (bool, np.bool_)):
+        return None
+    if issubclass(t, (int, np.integer)):
+        return int
+    if issubclass(t, (float, np.floating)):
+        return float
+    return None
+
+
+# Type of a homogeneous list of numbers (int or float), None otherwise
+def _number_type(values):
+    kinds = set(map(_kind, set(map(type, values))))
+    if len(kinds) == 1:
+        return kinds.pop()
+    return None
+
+
+def _to_array(values, kind):
+    try:
+        array = np.array(values, dtype=np.int64 if kind is int else np.float64)
+    except OverflowError:  # Integers beyond 64 bit
+        return None
+    return array
+
+
+class _Encoder:
+    def __init__(self):
+        self.arrays = []
+
+    def _add(self, array):
+        self.arrays.append(np.ascontiguousarray(array))
+        return len(self.arrays) - 1
+
+    # Values of a table as array with a mask of None values, or None if not encodable
+    def _table_values(self, values):
+        present = [v for v in values if v is not None]
+        if len(present) == 0:
+            return None
+
+        if all(isinstance(v, list) for v in present):
+            width = len(present[0])
+            if width == 0 or any(len(v) != width for v in present):
+                return None
+            kind = _number_type([x for v in present for x in v])
+            fill = [0] * width
+        else:
+            kind = _number_type(present)
+            fill = 0
+
+        if kind is None:
+            return None
+        array = _to_array([fill if v is None else v for v in values], kind)
+        if array is None:
+            return None
+
+        mask = None
+        if len(present) < len(values):
+            mask = self._add(np.array([v is None for v in values], dtype=bool))
+        return self._add(array), mask
+
+    def encode(self, obj):
+        if isinstance(obj, np.ndarray):
+            return {"__array__": self._add(obj)}
+
+        if isinstance(obj, (list, tuple)):
+            kind = _number_type(obj) if len(obj) > 0 else None
+            array = _to_array(obj, kind) if kind is not None else None
+            if array is not None:
+                return {"__list__": self._add(array)}
+            return [self.encode(v) for v in obj]
+
+        if isinstance(obj, dict):
+            keys = list(obj.keys())
+            if all(isinstance(k, str) for k in keys):
+                if _markers.isdisjoint(keys):
+                    return {k: self.encode(v) for k, v in obj.items()}
+                return {"__dict__": [[k, self.encode(v)] for k, v in obj.items()]}
+
+            kind = _number_type(keys)
+            if kind is not None:
+                key_array = _to_array(keys, kind)
+                values = self._table_values(list(obj.values()))
+                if key_array is not None and values is not None:
+                    return {"__table__": [self._add(key_array), *values]}
+
+            # Dict with other keys, e.g., sensor index -> table
+            return {"__dict__": [[k, self.encode(v)] for k, v in obj.items()]}
+
+        return obj
+
+
+def _decode(obj, arrays):
+    if isinstance(obj, list):
+        return [_decode(v, arrays) for v in obj]
+
+    if not isinstance(obj, dict):
+        return obj
+
+    if "__array__" in obj:
+        return arrays[obj["__array__"]]
+    if "__list__" in obj:
+        return arrays[obj["__list__"]].tolist()
+    if "__table__" in obj:
+        keys, values, mask = obj["__table__"]
+        values = arrays[values].tolist()
+        if mask is not None:
+            for i in np.flatnonzero(arrays[mask]):
+                values[i] = None
+        return dict(zip(arrays[keys].tolist(), values))
+    if "__dict__" in obj:
+        return {k: _decode(v, arrays) for k, v in obj["__dict__"]}
+
+    return {k: _decode(v, arrays) for k, v in obj.items()}
+
+
+def _padding(offset):
+    return -offset % _alignment
+
+
+def save(filename, model):
+    filename = str(filename)
+
+    encoder = _Encoder()
+    header = {"model": encoder.encode(model), "arrays": []}
+    offset = 0
+    for array in encoder.arrays:
+        offset += _padding(offset)
+        header["arrays"].append(
+            {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        )
+        offset += array.nbytes
+    header = json.dumps(header).encode("utf-8")
+
+    # Write atomically such that a model being loaded is never partially overwritten
+    tmp = "{}.{}".format(filename, os.getpid())
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(tmp, "wb") as f:
+        f.write(_prelude.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        start = _prelude.size + len(header)
+        f.write(b"\0" * _padding(start))
+
+        offset = 0
+        for array in encoder.arrays:
+            f.write(b"\0" * _padding(offset))
+            offset += _padding(offset)
+            f.write(array.tobytes())
+            offset += array.nbytes
+    os.replace(tmp, filename)
+
+
+def load(filename):
+    filename = str(filename)
+
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as f:
+        buffer = f.read()
+
+    if len(buffer) < _prelude.size:
+        raise ValueError("{} is not a binary model file".format(filename))
+    magic, version, length = _prelude.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("{} is not a binary model file".format(filename))
+    if version > VERSION:
+        raise ValueError(
+            "Model file {} has version {}, supported up to {}".format(
+                filename, version, VERSION
+            )
+        )
+
+    start = _prelude.size + length
+    header = json.loads(bytes(buffer[_prelude.size : start]).decode("utf-8"))
+    start += _padding(start)
+
+    # Read-only arrays backed by the buffer
+    arrays = []
+    for array in header["arrays"]:
+        dtype = np.dtype(array["dtype"])
+        count = int(np.prod(array["shape"], dtype=np.int64))
+        arrays.append(
+            np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=start + array["offset"]
+            ).reshape(array["shape"])
+        )
+
+    return _decode(header["model"], arrays)
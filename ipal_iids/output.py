@@ -0,0 +1,93 @@
+import json
+import threading
+
+import ipal_iids.settings as settings
+
+# Fields added to a message during the live phase which have to be written to the output
+OUTPUT_FIELDS = ["_iids-config", "ids", "metrics", "adjust"]
+
+
+# Append the fields added during the live phase to the raw JSON object of the input line
+# instead of re-encoding the whole message. Input lines containing these fields already,
+# e.g., IDS output processed again, are re-encoded to not write duplicate keys. The
+# message may be decoded partially only, hence the line is decoded again in this case.
+def splice_fields(line, msg):
+    keys = [key for key in OUTPUT_FIELDS if key in msg]
+
+    if any('"{}"'.format(key) in line for key in keys):  # Cheap check first
+        out = json.loads(line)
+        if any(key in out for key in keys):
+            out.update({key: msg[key] for key in keys})
+            return json.dumps(out) + "\n"
+
+    fields = ", ".join(json.dumps(key) + ": " + json.dumps(msg[key]) for key in keys)
+
+    head = line[: line.rindex("}")].rstrip()
+    if not head.endswith("{"):
+        head += ", "
+
+    return head + fields + "}\n"
+
+
+class OutputWriter:
+
+    # Collects the annotated IDS output and writes it in bulk to the underlying file.
+    # Pending output is written once it exceeds buffer_size bytes, at least every
+    # flush_interval seconds, and, with flush_on_alert, right after an alert.
+    def __init__(self, fd, buffer_size=65536, flush_interval=1.0, flush_on_alert=False):
+        self.fd = fd
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_on_alert = flush_on_alert
+
+        self._pending = []
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        # Flush in the background as well, such that output is not held back
+        # indefinitely while the live input is idle
+        if self.flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically)
+            self._flusher.daemon = True
+            self._flusher.start()
+
+    def _write_pending(self):
+        if len(self._pending) > 0:
+            self.fd.write("".join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+        self.fd.flush()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except (BrokenPipeError, ValueError):  # Closed by the main thread
+                return
+
+    def write(self, data, alert=False):
+        with self._lock:
+            self._pending.append(data)
+            self._pending_size += len(data)
+
+            if self._pending_size >= self.buffer_size or (
+                alert and self.flush_on_alert
+            ):
+                self._write_pending()
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+
+    def close(self, close_fd=True):
+        self._closed.set()
+
+        with self._lock:
+            try:
+                self._write_pending()
+            except BrokenPipeError:
+                settings.logger.error("Output closed before all messages were written")
+
+            if close_fd:
+                self.fd.close()
@@ -0,0 +1,175 @@
+import cProfile
+import os
+import pstats
+import signal
+
+from contextlib import contextmanager
+
+import ipal_iids.settings as settings
+
+# Profiles of the training and live phases (see --profile). The time spent in an IDS is
+# profiled separately per phase and IDS and written to <phase>.<IDS>.pstats, the
+# remaining time of a phase, e.g., parsing the input, to <phase>.pstats. Each profile is
+# also written as collapsed stacks (<...>.collapsed) for flame graph tools. With
+# --profile.interval, the live phase is sampled instead, which is cheap enough for long
+# runs and yields live.collapsed only.
+_profiles = {}  # (phase, IDS name or None) -> cProfile.Profile
+_active = []  # profiles currently running, only the innermost one is enabled
+_samples = {}  # phase -> {collapsed stack: number of samples}
+
+
+# Whether the phase is sampled instead of profiled per call
+def sampled(phase):
+    return phase == "live" and settings.profile_interval is not None
+
+
+@contextmanager
+def profile(phase, name=None):
+    if settings.profile is None:
+        yield
+    elif sampled(phase):
+        if name is None:
+            with _sampler(phase):
+                yield
+        else:  # The sampler covers the IDSs as well
+            yield
+    else:
+        with _profiler(phase, name):
+            yield
+
+
+@contextmanager
+def _profiler(phase, name):
+    if (phase, name) not in _profiles:
+        _profiles[(phase, name)] = cProfile.Profile()
+    profiler = _profiles[(phase, name)]
+
+    # Only one profiler can be enabled at a time, pause the enclosing one
+    if len(_active) > 0:
+        _active[-1].disable()
+    _active.append(profiler)
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active.pop()
+        if len(_active) > 0:
+            _active[-1].enable()
+
+
+# Call fn(*args) and profile it as part of the given phase and IDS
+def run(phase, name, fn, *args):
+    with profile(phase, name):
+        return fn(*args)
+
+
+def _label(code):
+    return "{} ({}:{})".format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno
+    )
+
+
+@contextmanager
+def _sampler(phase):
+    samples = _samples.setdefault(phase, {})
+    interval = settings.profile_interval / 1000
+
+    # Record the interrupted stack every interval of CPU time. Unlike a sampling thread,
+    # the signal handler runs in the profiled thread and is not biased towards the
+    # points where it releases the GIL, e.g., reading input
+    def sample(signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_label(frame.f_code))
+            frame = frame.f_back
+
+        stack = ";".join(reversed(stack))
+        samples[stack] = samples.get(stack, 0) + 1
+
+    handler = signal.signal(signal.SIGPROF, sample)
+    signal.setitimer(signal.ITIMER_PROF, interval, interval)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, handler)
+
+
+def _function_label(function):
+    filename, line, name = function
+    if filename == "~":  # Built-in function
+        return name
+    return "{} ({}:{})".format(name, os.path.basename(filename), line)
+
+
+# Collapsed stacks of a profile in microseconds. cProfile records callers but not whole
+# stacks, hence the time of a function is split among its callers by the cumulative time
+# spent in each of them, as done by common pstats to flame graph converters
+def _collapse(stats, max_depth=64):
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((function, cumulative))
+
+    stacks = {}
+
+    def visit(function, share, path):
+        total = stats.stats[function][2]
+        path = path + [function]
+
+        weight = int(total * share * 1e6)
+        if weight > 0:
+            stack = ";".join(_function_label(f) for f in path)
+            stacks[stack] = stacks.get(stack, 0) + weight
+
+        if len(path) >= max_depth:
+            return
+        for callee, cumulative in callees.get(function, []):
+            callee_cumulative = stats.stats[callee][3]
+            if callee not in path and callee_cumulative > 0:  # Skip recursion
+                visit(callee, share * cumulative / callee_cumulative, path)
+
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        if len(callers) == 0:
+            visit(function, 1.0, [])
+
+    return stacks
+
+
+def _write_collapsed(filename, stacks):
+    with open(filename, "w") as f:
+        for stack, weight in sorted(stacks.items()):
+            f.write("{} {}\n".format(stack, weight))
+
+
+# Write the profiles of the given phase and IDS (all if None) to the profile directory
+def write(phase=None, name=None):
+    if settings.profile is None:
+        return
+
+    for (profile_phase, profile_name), profiler in _profiles.items():
+        if phase is not None and (profile_phase, profile_name) != (phase, name):
+            continue
+
+        filename = profile_phase
+        if profile_name is not None:
+            filename = "{}.{}".format(profile_phase, profile_name)
+        filename = os.path.join(settings.profile, filename)
+
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(filename + ".pstats")
+        _write_collapsed(filename + ".collapsed", _collapse(stats))
+
+        settings.logger.info("Wrote profile {}.pstats".format(filename))
+
+    for sample_phase, samples in _samples.items():
+        if phase is not None and (sample_phase, None) != (phase, name):
+            continue
+
+        filename = os.path.join(settings.profile, sample_phase + ".collapsed")
+        _write_collapsed(filename, samples)
+        settings.logger.info(
+            "Wrote {} stack samples to {}".format(sum(samples.values()), filename)
+        )
@@ -0,0 +1,100 @@
+import importlib
+import importlib.metadata
+import logging
+
+from collections.abc import Mapping
+
+# Same as settings.logger, which cannot be imported here as settings uses the registry
+logger = logging.getLogger("ipal-iids")
+
+
+def _entry_points(group):
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=group)
+    return entry_points.get(group, [])  # Python < 3.10
+
+
+class Registry(Mapping):
+
+    # Maps names to classes. Each entry is a "module:class" path or a metadata dict with
+    # the path as "class" and further information such as "description" or "requires".
+    # A class is imported on first access only, such that unused implementations and
+    # their dependencies (e.g., TensorFlow or scikit-learn) are never loaded. Iterating
+    # over the names or reading the metadata does not import any implementation.
+    #
+    # Further entries are discovered from the package entry points of the given group.
+    # An entry point either refers to a path or metadata dict as above, which keeps the
+    # implementation out of the module defining the entry point, or to the class.
+    def __init__(self, entries, group=None):
+        self._entries = {name: self._to_metadata(e) for name, e in entries.items()}
+        self._classes = {}
+        self._group = group
+
+    def _to_metadata(self, entry):
+        if isinstance(entry, str):
+            return {"class": entry}
+        return dict(entry)
+
+    def _discover(self):
+        if self._group is None:
+            return
+
+        group = self._group
+        self._group = None  # Discover once only
+
+        for entry_point in _entry_points(group):
+            if entry_point.name in self._entries:
+                logger.warning(
+                    "Ignoring plugin {} of {}: name already registered".format(
+                        entry_point.name, group
+                    )
+                )
+                continue
+
+            try:
+                entry = entry_point.load()
+            except Exception as e:
+                logger.warning(
+                    "Failed to load plugin {} of {}: {}".format(
+                        entry_point.name, group, e
+                    )
+                )
+                continue
+
+            if isinstance(entry, (str, dict)):
+                self._entries[entry_point.name] = self._to_metadata(entry)
+            else:  # The class itself
+                self._entries[entry_point.name] = {"class": None}
+                self._classes[entry_point.name] = entry
+
+    # Information about an entry without importing its implementation
+    def metadata(self, name):
+        self._discover()
+
+        entry = self._entries[name]
+        if name in self._classes:  # Take missing information from the loaded class
+            cls = self._classes[name]
+            entry = {
+                "description": getattr(cls, "_description", ""),
+                "requires": getattr(cls, "_requires", []),
+                **{k: v for k, v in entry.items() if v is not None},
+            }
+
+        return {"name": name, "description": "", "requires": [], **entry}
+
+    def __getitem__(self, name):
+        self._discover()
+
+        if name not in self._classes:
+            module, cls = self._entries[name]["class"].split(":")
+            self._classes[name] = getattr(importlib.import_module(module), cls)
+        return self._classes[name]
+
+    def __iter__(self):
+        self._discover()
+        return iter(self._entries)
+
+    def __len__(self):
+        self._discover()
+        return len(self._entries)
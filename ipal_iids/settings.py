@@ -1,4 +1,5 @@
 from io import TextIOWrapper
+from typing import List
 import logging
 
 from ids.utils import get_all_iidss
@@ -12,13 +13,30 @@ compresslevel = 9  # 0 no compress, 1 large/fast, 9 small/slow
 config = None
 train_ipal = None
 train_state = None
-live_ipal = None
-live_ipalfd: TextIOWrapper
+live_ipal = None  # single input or list of inputs
+live_ipalfds: List[TextIOWrapper] = []
 live_state = None
-live_statefd: TextIOWrapper
+live_statefds: List[TextIOWrapper] = []
+live_reorder = 0  # messages buffered per input to restore their order
+train_cache = None  # directory of cached training features
+train_spill = None  # directory of memory-mapped training features
+train_jobs = 1  # number of IDSs trained in parallel
 retrain = False
 output = None
 outputfd: TextIOWrapper
+outputwriter = None  # OutputWriter buffering the annotated output
+output_buffer = 65536  # bytes of output collected before writing
+output_flush_interval = 1.0  # seconds between flushes of buffered output
+output_flush_on_alert = False
+output_passthrough = False  # splice IDS fields into the raw input lines
+batch_size = 1  # number of live messages handed to the IDSs at once
+batch_wait = None  # maximum latency in ms before an incomplete batch is handed over
+stats = None  # file the live statistics are written to
+stats_interval = 10.0  # seconds between rewrites of the statistics file
+stats_sample = 64  # messages between batches timed for the statistics
+profile = None  # directory the profiles are written to
+# ms between stack samples of the live phase, None profiles each call
+profile_interval = None
 
 # Logging settings
 logger = logging.getLogger("ipal-iids")
@@ -27,7 +45,7 @@ logformat = "%(levelname)s:%(name)s:%(message)s"
 logfile = None
 
 # IDS parameters
-idss = {ids._name: {"_type": ids._name} for ids in get_all_iidss().values()}
+idss = {name: {"_type": name} for name in get_all_iidss().keys()}
 
 
 def iids_settings_to_dict():
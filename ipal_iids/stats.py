@@ -0,0 +1,253 @@
+import json
+import os
+import time
+
+from array import array
+from contextlib import contextmanager
+
+import numpy as np
+
+import ipal_iids.settings as settings
+
+# Statistics of the live phase (see --stats): per IDS latency histograms, throughput
+# and alert counts as well as the time spent per phase. Messages and alerts are counted
+# exactly, times are taken from a sample of the batches (--stats.sample) since timing
+# each message would slow down cheap IDSs noticeably. The raw timings are only
+# appended to arrays and aggregated when the statistics are written. Times are measured
+# per batch, i.e., a batch of n messages counts its latency divided by n for n messages.
+_start = None
+_last_dump = None
+_countdown = 0  # messages until the next batch is timed
+_period = 0  # value the countdown was last reset to
+_input_start = None  # end of the last timed batch if reading the next one is timed
+_msgs = 0  # messages before the last reset of the countdown
+_alerts = 0  # messages any IDS alerted on
+_sampled_msgs = 0  # messages of the timed batches
+_idss = {}  # IDS name -> IDSStats
+
+timing = False  # whether the current batch is timed
+# Nanoseconds spent per phase in the timed batches: reading and parsing the input,
+# preprocessing (included in the time of the IDSs), the IDSs, and writing the output
+phases = {"input": 0, "preprocess": 0, "ids": 0, "output": 0}
+
+
+class Histogram:
+
+    # Counts values (latencies in ns) in fixed buckets. Values below 16 have a bucket
+    # each, above there are eight buckets per power of two, i.e., quantiles are
+    # accurate up to 12.5%.
+    _buckets = 512
+
+    def __init__(self):
+        self.counts = np.zeros(self._buckets, dtype=np.int64)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def add(self, values, counts):
+        if len(values) == 0:
+            return
+
+        bits = np.frexp(values.astype(np.float64))[1]  # Bit length of the integers
+        shift = np.maximum(bits - 4, 0)
+        index = np.where(bits <= 4, values, (shift << 3) + (values >> shift))
+        self.counts += np.bincount(
+            np.minimum(index, self._buckets - 1),
+            weights=counts,
+            minlength=self._buckets,
+        ).astype(np.int64)
+
+        self.total += int(counts.sum())
+        self.sum += int((values * counts).sum())
+        self.max = max(self.max, int(values.max()))
+
+    def _upper_bound(self, index):
+        if index < 16:
+            return index + 1
+        shift = (index >> 3) - 1
+        return ((index & 7) + 9) << shift
+
+    def quantile(self, q):
+        if self.total == 0:
+            return 0
+
+        index = int(np.searchsorted(np.cumsum(self.counts), q * self.total))
+        return min(self._upper_bound(index), self.max)
+
+    def to_dict(self, scale=1):
+        return {
+            "p50": self.quantile(0.5) / scale,
+            "p90": self.quantile(0.9) / scale,
+            "p99": self.quantile(0.99) / scale,
+            "max": self.max / scale,
+            "mean": self.sum / max(self.total, 1) / scale,
+        }
+
+
+class IDSStats:
+    def __init__(self):
+        self.timings = array("q")  # (ns, messages) per timed batch not yet aggregated
+        self.msgs = 0
+        self.alerts = 0
+        self.timed_msgs = 0
+        self.ns = 0
+        self.latency = Histogram()
+
+    def aggregate(self):
+        timings = np.array(self.timings, dtype=np.int64).reshape(-1, 2)
+        self.timings = array("q")
+
+        ns, msgs = timings.T
+        self.latency.add(ns // np.maximum(msgs, 1), msgs)
+        self.timed_msgs += int(msgs.sum())
+        self.ns += int(ns.sum())
+
+    def to_dict(self):
+        self.aggregate()
+        seconds = self.ns / 1e9
+
+        return {
+            "msgs": self.msgs,
+            "alerts": self.alerts,
+            "timed_msgs": self.timed_msgs,
+            "seconds": seconds,
+            "msgs_per_second": self.timed_msgs / seconds if seconds > 0 else None,
+            "latency_us": self.latency.to_dict(scale=1000),
+        }
+
+
+def start():
+    global _start, _last_dump, _countdown, _period, _input_start, _msgs, _alerts
+    global _sampled_msgs
+
+    _start = _last_dump = _input_start = time.perf_counter_ns()
+    _countdown = _period = _msgs = _alerts = _sampled_msgs = 0
+    _idss.clear()
+    for phase in phases:
+        phases[phase] = 0
+
+
+# Count a batch before it is processed and decide whether to time it. Kept as cheap
+# as possible as it is called for every batch
+def sample(batch):
+    global _countdown
+
+    _countdown -= len(batch)
+    if _countdown > 0:
+        return False
+    return _sample()
+
+
+def _sample():
+    global _countdown, _period, _input_start, _msgs, timing
+
+    if _input_start is not None:  # First batch after a timed one, time reading it
+        phases["input"] += time.perf_counter_ns() - _input_start
+        _input_start = None
+
+        # The next period starts with this batch
+        _countdown += settings.stats_sample
+        _period += settings.stats_sample
+        if _countdown > 0:
+            return False
+
+    _msgs += _period - _countdown
+    _countdown = _period = 0  # Take the slow path again after this batch
+    timing = True
+    return True
+
+
+def _ids(name):
+    if name not in _idss:
+        _idss[name] = IDSStats()
+    return _idss[name]
+
+
+# Count the (alert, metric) results of an IDS on a batch, called for every batch
+def count_ids(name, results):
+    ids = _ids(name)
+    ids.msgs += len(results)
+    ids.alerts += sum(1 for alert, _ in results if alert)
+
+
+# Count the messages of a batch any IDS alerted on, called for every batch
+def count_alerts(msgs):
+    global _alerts
+
+    _alerts += sum(1 for msg in msgs if msg["ids"])
+
+
+# Nanoseconds an IDS spent on a timed batch of msgs messages
+def add_ids(name, ns, msgs):
+    _ids(name).timings.extend((ns, msgs))
+
+
+# Time the preprocessing of a FeatureIDS during a timed batch. The preprocessing method
+# is wrapped on the instance, such that the IDSs do not depend on the statistics
+@contextmanager
+def timed_preprocessing(ids):
+    preprocess = getattr(ids, "_preprocess_msg", None)
+    if preprocess is None:  # No FeatureIDS
+        yield
+        return
+
+    def timed(msg):
+        start = time.perf_counter_ns()
+        try:
+            return preprocess(msg)
+        finally:
+            phases["preprocess"] += time.perf_counter_ns() - start
+
+    ids._preprocess_msg = timed
+    try:
+        yield
+    finally:
+        del ids._preprocess_msg
+
+
+# Finish a timed batch, which was received at start and whose output was written since
+# output_start, and write the statistics once the interval has passed
+def add_batch(msgs, start, output_start):
+    global _input_start, _sampled_msgs, timing
+
+    now = time.perf_counter_ns()
+    phases["ids"] += output_start - start
+    phases["output"] += now - output_start
+    _sampled_msgs += len(msgs)
+
+    if now - _last_dump >= settings.stats_interval * 1e9:
+        dump()
+
+    timing = False
+    _input_start = time.perf_counter_ns()
+
+
+def to_dict():
+    elapsed = (time.perf_counter_ns() - _start) / 1e9
+    msgs = _msgs + _period - _countdown
+
+    return {
+        "elapsed": elapsed,
+        "msgs": msgs,
+        "msgs_per_second": msgs / elapsed if elapsed > 0 else None,
+        "alerts": _alerts,
+        "sample": settings.stats_sample,
+        "sampled_msgs": _sampled_msgs,
+        "phases": {phase: ns / 1e9 for phase, ns in phases.items()},
+        "idss": {name: ids.to_dict() for name, ids in _idss.items()},
+    }
+
+
+def dump():
+    global _last_dump
+
+    if _start is None:  # Live phase not started
+        return
+
+    # Write atomically such that readers never see a partial file
+    tmp = "{}.{}".format(settings.stats, os.getpid())
+    with open(tmp, "w") as f:
+        json.dump(to_dict(), f, indent=4)
+    os.replace(tmp, settings.stats)
+
+    _last_dump = time.perf_counter_ns()
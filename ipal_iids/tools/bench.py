@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import ipal_iids.iids as iids
+import ipal_iids.settings as settings
+from ids.utils import get_all_iidss
+
+# Settings overwritten in the default configuration of each IDS. Grid searches are
+# reduced to their first value and run in a single process without printing progress
+_overrides = {"jobs": 1, "verbose": 0}
+_structural = ["features", "preprocessors"]  # List settings which are no grid
+
+# Defaults rejected by recent scikit-learn versions: 'auto' is no max_features anymore,
+# and the forests pass min_impurity_decrease as oob_score as well, which has to be a bool
+_forest_overrides = {"max_features": ["sqrt"], "min_impurity_decrease": [False]}
+_ids_overrides = {"ExtraTrees": _forest_overrides, "RandomForest": _forest_overrides}
+
+
+# Initialize logger
+def initialize_logger(args):
+    if args.log:
+        settings.log = getattr(logging, args.log.upper(), None)
+
+        if not isinstance(settings.log, int):
+            logging.getLogger("ipal-iids-bench").error(
+                "Option '--log' parameter not found"
+            )
+            exit(1)
+
+    if args.logfile:
+        settings.logfile = args.logfile
+        logging.basicConfig(
+            filename=settings.logfile, level=settings.log, format=settings.logformat
+        )
+    else:
+        logging.basicConfig(level=settings.log, format=settings.logformat)
+
+    settings.logger = logging.getLogger("ipal-iids-bench")
+
+
+def prepare_arg_parser(parser):
+
+    parser.add_argument(
+        "idss",
+        metavar="IDS",
+        help="IDSs to benchmark. Default are all registered IDSs.",
+        nargs="*",
+    )
+
+    parser.add_argument(
+        "--output",
+        dest="output",
+        metavar="FILE",
+        default="-",
+        help="file to write the results as JSON to, '-' for stdout. (Default: '-')",
+        required=False,
+    )
+    parser.add_argument(
+        "--workdir",
+        dest="workdir",
+        metavar="DIR",
+        default=None,
+        help="directory to keep the generated datasets, configs and models in. "
+        "(Default: temporary directory)",
+        required=False,
+    )
+
+    # Workload
+    parser.add_argument(
+        "--seed",
+        dest="seed",
+        metavar="INT",
+        type=int,
+        default=0,
+        help="seed of the generated datasets. (Default: 0)",
+        required=False,
+    )
+    parser.add_argument(
+        "--train-msgs",
+        dest="train_msgs",
+        metavar="INT",
+        type=int,
+        default=20000,
+        help="number of generated training messages. (Default: 20000)",
+        required=False,
+    )
+    parser.add_argument(
+        "--live-msgs",
+        dest="live_msgs",
+        metavar="INT",
+        type=int,
+        default=20000,
+        help="number of generated live messages. (Default: 20000)",
+        required=False,
+    )
+    parser.add_argument(
+        "--sensors",
+        dest="sensors",
+        metavar="INT",
+        type=int,
+        default=8,
+        help="number of sensors, each one is a feature of the IDSs. (Default: 8)",
+        required=False,
+    )
+    parser.add_argument(
+        "--cardinality",
+        dest="cardinality",
+        metavar="INT",
+        type=int,
+        default=16,
+        help="number of distinct values of a sensor. (Default: 16)",
+        required=False,
+    )
+    parser.add_argument(
+        "--rate",
+        dest="rate",
+        metavar="FLOAT",
+        type=float,
+        default=10.0,
+        help="messages per second of the generated datasets. (Default: 10.0)",
+        required=False,
+    )
+    parser.add_argument(
+        "--attacks",
+        dest="attacks",
+        metavar="INT",
+        type=int,
+        default=5,
+        help="number of attacks injected into the live dataset. (Default: 5)",
+        required=False,
+    )
+    parser.add_argument(
+        "--train-attacks",
+        dest="train_attacks",
+        metavar="INT",
+        type=int,
+        default=5,
+        help="number of attacks injected into the training dataset, required by "
+        "supervised IDSs. (Default: 5)",
+        required=False,
+    )
+    parser.add_argument(
+        "--attack-length",
+        dest="attack_length",
+        metavar="INT",
+        type=int,
+        default=100,
+        help="number of messages of an attack. (Default: 100)",
+        required=False,
+    )
+    parser.add_argument(
+        "--batch-size",
+        dest="batch_size",
+        metavar="INT",
+        type=int,
+        default=1,
+        help="number of live messages handed to the IDSs at once. (Default: 1)",
+        required=False,
+    )
+
+    # Logging
+    parser.add_argument(
+        "--log",
+        dest="log",
+        metavar="STR",
+        help="define logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL). Default is WARNING.",
+        required=False,
+    )
+    parser.add_argument(
+        "--logfile",
+        dest="logfile",
+        metavar="FILE",
+        default=False,
+        help="File to log to. Default is stderr.",
+        required=False,
+    )
+
+
+# Generate an IPAL dataset and the corresponding state dataset. Each message is sent by
+# one of the sensors in turn and reports its value, which follows a random walk over
+# cardinality levels. During an attack, the reported values are out of range and the
+# messages arrive ten times faster. Attack messages are labeled with the attack number
+def generate(
+    ipal,
+    state,
+    msgs,
+    seed=0,
+    sensors=8,
+    cardinality=16,
+    rate=10.0,
+    attacks=0,
+    attack_length=100,
+):
+    rng = random.Random(seed)
+
+    # Non-overlapping attacks at random positions
+    slots = max(msgs // attack_length, 1)
+    attack = {}
+    for n, slot in enumerate(sorted(rng.sample(range(slots), min(attacks, slots)))):
+        for i in range(slot * attack_length, (slot + 1) * attack_length):
+            attack[i] = n + 1
+
+    names = ["sensor{}".format(k) for k in range(sensors)]
+    levels = [rng.randrange(cardinality) for _ in names]
+    timestamp = 1000.0
+
+    with open(ipal, "w") as ipal_fd, open(state, "w") as state_fd:
+        for i in range(msgs):
+            k = i % sensors
+            malicious = attack.get(i, False)
+
+            if rng.random() < 0.2:
+                levels[k] = min(
+                    max(levels[k] + rng.choice([-1, 1]), 0), cardinality - 1
+                )
+            value = levels[k]
+            if malicious:
+                value = cardinality + rng.randrange(cardinality)
+
+            interval = rng.uniform(0.9, 1.1) / rate
+            timestamp += interval / 10 if malicious else interval
+
+            msg = {
+                "activity": "inform",
+                "crc": True,
+                "data": {names[k]: value},
+                "dest": "10.0.0.1:502",
+                "id": i,
+                "length": 12,
+                "malicious": malicious,
+                "protocol": "modbus",
+                "responds to": [],
+                "src": "10.0.1.{}:502".format(k + 1),
+                "timestamp": timestamp,
+                "type": 3,
+            }
+            ipal_fd.write(json.dumps(msg) + "\n")
+
+            msg = {
+                "id": i,
+                "malicious": malicious,
+                "state": {name: levels[j] for j, name in enumerate(names)},
+                "timestamp": timestamp,
+            }
+            msg["state"][names[k]] = value
+            state_fd.write(json.dumps(msg) + "\n")
+
+
+# Default configuration of an IDS adapted to the generated datasets and updated with
+# the given settings
+def ids_config(name, sensors, overrides=None):
+    settings.idss = {name: {"_type": name}}
+    config = {"_type": name, **get_all_iidss()[name](name=name)._default_settings}
+
+    for key, value in config.items():
+        if key in _overrides:
+            config[key] = _overrides[key]
+        elif isinstance(value, list) and len(value) > 1 and key not in _structural:
+            config[key] = value[:1]
+
+    names = ["sensor{}".format(k) for k in range(sensors)]
+    if "features" in config:
+        config["features"] = ["state;{}".format(name) for name in names]
+    if "sensor" in config:
+        config["sensor"] = names[0]
+
+    config["model-file"] = "./{}.model".format(name)
+    config.update(_ids_overrides.get(name, {}))
+    config.update(overrides or {})
+    return config
+
+
+# Size of the model files, some IDSs store further files next to the model file
+def _model_size(path):
+    size = 0
+    for filename in glob.glob(glob.escape(path) + "*"):
+        if os.path.isdir(filename):
+            for root, _, files in os.walk(filename):
+                size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        else:
+            size += os.path.getsize(filename)
+    return size
+
+
+def _count_lines(filename):
+    with open(filename, "rb") as f:
+        return sum(1 for _ in f)
+
+
+# Train, save, load and run a single IDS on the datasets in the working directory
+def run_ids(name, workdir, sensors=8, batch_size=1, overrides=None):
+    settings.config = os.path.join(workdir, "{}.config".format(name))
+    settings.idss = {name: ids_config(name, sensors, overrides)}
+    with open(settings.config, "w") as f:
+        json.dump(settings.idss, f, indent=4)
+
+    ids = get_all_iidss()[settings.idss[name]["_type"]](name=name)
+
+    fmt = "state" if ids.requires("train.state") else "ipal"
+    train = os.path.join(workdir, "train.{}".format(fmt))
+    live = os.path.join(workdir, "live.{}".format(fmt))
+    result = {"format": fmt}
+
+    start = time.perf_counter()
+    if fmt == "state":
+        ids.train(state=train)
+    else:
+        ids.train(ipal=train)
+    result["train_seconds"] = time.perf_counter() - start
+    result["train_msgs_per_second"] = _count_lines(train) / result["train_seconds"]
+
+    # Saving and loading is optional
+    try:
+        start = time.perf_counter()
+        saved = ids.save_trained_model()
+        result["save_seconds"] = time.perf_counter() - start
+    except NotImplementedError:
+        saved = False
+
+    if saved:
+        path = str(ids._resolve_model_file_path())
+        result["model_bytes"] = _model_size(path)
+
+        loaded = get_all_iidss()[settings.idss[name]["_type"]](name=name)
+        start = time.perf_counter()
+        if loaded.load_trained_model():
+            result["load_seconds"] = time.perf_counter() - start
+            ids = loaded
+
+    settings.batch_size = batch_size
+    with open(live) as fd:
+        if fmt == "state":
+            settings.live_state, settings.live_statefds = live, [fd]
+        else:
+            settings.live_ipal, settings.live_ipalfds = live, [fd]
+
+        start = time.perf_counter()
+        iids.live_idss([ids])
+        result["live_seconds"] = time.perf_counter() - start
+    result["live_msgs_per_second"] = _count_lines(live) / result["live_seconds"]
+    return result
+
+
+def _bench_worker(name, workdir, sensors, batch_size, overrides, conn):
+    # The forked process starts with the memory resident in the parent, e.g., imported
+    # modules. Its peak is counted from there on, i.e., the memory used by the IDS
+    inherited = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    try:
+        result = run_ids(name, workdir, sensors, batch_size, overrides)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_bytes"] = (peak - inherited) * 1024
+    except SystemExit as e:
+        result = {"error": "exit {}".format(e.code)}
+    except Exception as e:  # Keep the last line of multi-line errors only
+        lines = str(e).strip().splitlines() or [""]
+        result = {"error": "{}: {}".format(type(e).__name__, lines[-1])}
+
+    conn.send(result)
+    conn.close()
+
+
+# Run each IDS in a forked process such that its peak memory is measured in isolation
+# and failing IDSs do not affect the others. Configs maps IDS names to settings which
+# overwrite their default configuration
+def bench(names, workdir, sensors=8, batch_size=1, configs=None):
+    configs = configs or {}
+    context = multiprocessing.get_context("fork")
+
+    results = {}
+    for name in names:
+        settings.logger.info("Benchmarking {}".format(name))
+
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_bench_worker,
+            args=(name, workdir, sensors, batch_size, configs.get(name), sender),
+        )
+        process.start()
+        sender.close()
+
+        try:
+            results[name] = receiver.recv()
+        except EOFError:  # e.g., killed by the out-of-memory killer
+            results[name] = {"error": "exit {}".format(process.exitcode)}
+        process.join()
+
+        if "error" in results[name]:
+            settings.logger.warning(
+                "Benchmark of {} failed: {}".format(name, results[name]["error"])
+            )
+
+    return results
+
+
+def main():
+    # Argument parser and settings
+    parser = argparse.ArgumentParser()
+    prepare_arg_parser(parser)
+    args = parser.parse_args()
+    initialize_logger(args)
+
+    # Check the names only, the IDSs are imported by the benchmark processes
+    available = list(get_all_iidss())
+    names = args.idss or available
+    for name in names:
+        if name not in available:
+            settings.logger.error("IDS {} not found".format(name))
+            exit(1)
+
+    if args.attack_length <= 0 or args.sensors <= 0 or args.cardinality <= 0:
+        settings.logger.error("Sensors, cardinality and attack length must be positive")
+        exit(1)
+
+    workload = {
+        "seed": args.seed,
+        "train_msgs": args.train_msgs,
+        "live_msgs": args.live_msgs,
+        "sensors": args.sensors,
+        "cardinality": args.cardinality,
+        "rate": args.rate,
+        "attacks": args.attacks,
+        "train_attacks": args.train_attacks,
+        "attack_length": args.attack_length,
+        "batch_size": args.batch_size,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+
+        settings.logger.info("Generating datasets in {}".format(workdir))
+        for phase, msgs, seed, attacks in [
+            ("train", args.train_msgs, args.seed, args.train_attacks),
+            ("live", args.live_msgs, args.seed + 1, args.attacks),
+        ]:
+            generate(
+                os.path.join(workdir, "{}.ipal".format(phase)),
+                os.path.join(workdir, "{}.state".format(phase)),
+                msgs,
+                seed=seed,
+                sensors=args.sensors,
+                cardinality=args.cardinality,
+                rate=args.rate,
+                attacks=attacks,
+                attack_length=args.attack_length,
+            )
+
+        results = {
+            "version": settings.version,
+            "python": platform.python_version(),
+            "workload": workload,
+            "idss": bench(names, workdir, args.sensors, args.batch_size),
+        }
+
+    if args.output == "-":
+        json.dump(results, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
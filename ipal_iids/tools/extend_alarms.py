@@ -3,7 +3,9 @@ import argparse
 import gzip
 import json
 import logging
+import os
 import sys
+from collections import deque
 
 import ipal_iids.settings as settings
 
@@ -16,7 +18,7 @@ def open_file(filename, mode="r"):
     elif filename == "-":
         return sys.stdin
     else:
-        return open(filename, mode=mode, buffering=1)
+        return open(filename, mode=mode)
 
 
 # Initialize logger
@@ -50,6 +52,16 @@ def prepare_arg_parser(parser):
         nargs="+",
     )
 
+    parser.add_argument(
+        "--lookback",
+        dest="lookback",
+        metavar="INT",
+        type=int,
+        default=None,
+        help="maximum number of preceding messages an alarm may be extended to. Determined by reading each file once beforehand if not set. Required when reading from stdin ('-').",
+        required=False,
+    )
+
     # Logging
     parser.add_argument(
         "--log",
@@ -68,41 +80,94 @@ def prepare_arg_parser(parser):
     )
 
 
-def extend_alarms(file):
+# Largest offset of the alarm adjustments in a file, i.e., the lookback required
+def max_lookback(file):
+    lookback = 0
 
-    ipal = []
+    with open_file(file, mode="rt") as f:
+        for line in f:
+            if '"adjust"' not in line:  # Skip decoding lines without adjustments
+                continue
 
-    # Load file into memory
-    with open_file(file, mode="r") as f:
-        for line in f.readlines():
-            ipal.append(json.loads(line))
+            for adjust in json.loads(line).get("adjust", []):
+                lookback = max(lookback, -adjust[0])
 
-    # Extend alarms
-    for i in range(len(ipal)):
-        if "adjust" not in ipal[i]:
-            continue
+    return lookback
 
-        # Adjust alert
-        for offset, alert, metric in ipal[i]["adjust"]:
-            assert offset <= 0
 
-            if i + offset < 0:  # Log warning!
-                settings.logger.error(
-                    f"Offset is {offset + i}! Defaulting to dataset start."
-                )
-                offset = -i
+def adjust_alarms(window, i):
+    # The window holds the current message (offset 0) and at most the preceding
+    # lookback messages, which have not been written yet
+    msg = window[-1]
 
-            ipal[i + offset]["ids"] = alert
-            ipal[i + offset]["metrics"] = {
-                k: metric for k in ipal[i + offset]["metrics"]
-            }
+    # Adjust alert. Entries are either ranges [start, end, alert, metric] or
+    # single offsets [offset, alert, metric] as written by older versions
+    for adjust in msg["adjust"]:
+        if len(adjust) == 3:
+            adjust = [adjust[0], *adjust]
+        start, end, alert, metric = adjust
+        assert start <= end <= 0
 
-        del ipal[i]["adjust"]
+        if i + start < 0:  # Log warning!
+            settings.logger.error(
+                f"Offset is {start + i}! Defaulting to dataset start."
+            )
+            start = -i
+            end = max(end, start)
 
-    # Write file to disc
-    with open_file(file, "wt") as f:
-        for out in ipal:
-            f.write(json.dumps(out) + "\n")
+        if -start >= len(window):  # Messages already written
+            settings.logger.error(
+                f"Offset {start} exceeds the lookback of {len(window) - 1} messages!"
+            )
+            start = -len(window) + 1
+            if end < start:
+                continue
+
+        for offset in range(start, end + 1):
+            out = window[len(window) - 1 + offset]
+            out["ids"] = alert
+            out["metrics"] = {k: metric for k in out["metrics"]}
+
+    del msg["adjust"]
+
+
+def extend_alarms(file, lookback=None):
+
+    if lookback is None:
+        if file == "-":
+            settings.logger.error("Option '--lookback' is required to read from stdin")
+            exit(1)
+        lookback = max_lookback(file)
+
+    # Stream the file through a window of the last lookback messages into a temporary
+    # file, which replaces the file at the end. Output of stdin is written to stdout
+    if file == "-":
+        tmp = None
+        outfile = sys.stdout
+    else:
+        root, ext = os.path.splitext(file) if file.endswith(".gz") else (file, "")
+        tmp = "{}.{}{}".format(root, os.getpid(), ext)
+        outfile = open_file(tmp, "wt")
+
+    window = deque()
+    with open_file(file, mode="rt") as f:
+        for i, line in enumerate(f):
+            window.append(json.loads(line))
+
+            if "adjust" in window[-1]:
+                adjust_alarms(window, i)
+
+            if len(window) > lookback:
+                outfile.write(json.dumps(window.popleft()) + "\n")
+
+    for out in window:
+        outfile.write(json.dumps(out) + "\n")
+
+    if tmp is None:
+        outfile.flush()
+    else:
+        outfile.close()
+        os.replace(tmp, file)
 
 
 def main():
@@ -112,6 +177,10 @@ def main():
     args = parser.parse_args()
     initialize_logger(args)
 
+    if args.lookback is not None and args.lookback < 0:
+        settings.logger.error("Option '--lookback' must be non-negative")
+        exit(1)
+
     N = 0
     for file in args.files:
         N += 1
@@ -119,7 +188,7 @@ def main():
             "Extending Alarms ({}/{}) {}".format(N, len(args.files), file)
         )
 
-        extend_alarms(file)
+        extend_alarms(file, lookback=args.lookback)
 
 
 if __name__ == "__main__":
@@ -18,6 +18,9 @@ class AggregatePreprocessor(Preprocessor):
     def fit(self, values):
         pass
 
+    def partial_fit(self, values):
+        pass
+
     def transform(self, value):
 
         self.aggregate += value
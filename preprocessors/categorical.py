@@ -17,8 +17,14 @@ class CategoricalPreprocessor(Preprocessor):
         super().__init__(features)
 
         self.encoder = [None] * len(self.features)
+        self._values = {}  # feature -> distinct values while fitting
 
     def fit(self, values):
+        self.partial_fit(values)
+        self.finish_fit()
+
+    # Collect the distinct values of each feature
+    def partial_fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
@@ -26,10 +32,19 @@ class CategoricalPreprocessor(Preprocessor):
             if not self.features[i]:
                 continue
 
-            X = list(set([v[i] for v in values]))
+            self._values.setdefault(i, set()).update([v[i] for v in values])
+
+    def finish_fit(self):
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            X = list(self._values[i])
             classes = np.eye(len(X))
             self.encoder[i] = {str(x): list(classes[X.index(x)]) for x in X}
 
+        self._values = {}
+
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
@@ -16,6 +16,9 @@ class GradientPreprocessor(Preprocessor):
     def fit(self, values):
         pass
 
+    def partial_fit(self, values):
+        pass
+
     def transform(self, value):
 
         for i in range(len(self.features)):
@@ -13,6 +13,9 @@ class IndicateNonePreprocessor(Preprocessor):
     def fit(self, values):
         pass
 
+    def partial_fit(self, values):
+        pass
+
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
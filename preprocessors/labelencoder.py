@@ -17,19 +17,34 @@ class LabelEncoderPreprocessor(Preprocessor):
         super().__init__(features)
         self.encoder = [None] * len(self.features)
         self.fitdata = [None] * len(self.features)
+        self._values = {}  # feature -> distinct values while fitting
 
     def fit(self, values):
+        self.partial_fit(values)
+        self.finish_fit()
+
+    # Collect the distinct values of each feature
+    def partial_fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            self._values.setdefault(i, set()).update([v[i] for v in values])
+
+    def finish_fit(self):
         for i in range(len(self.features)):
             if not self.features[i]:
                 continue
 
             self.encoder[i] = LabelEncoder()
-            self.fitdata[i] = list(set([v[i] for v in values]))
+            self.fitdata[i] = list(self._values[i])
             self.encoder[i].fit(self.fitdata[i])
 
+        self._values = {}
+
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
@@ -18,8 +18,14 @@ class MeanPreprocessor(Preprocessor):
         super().__init__(features)
         self.means = [None] * len(self.features)
         self.stds = [None] * len(self.features)
+        self._moments = {}  # feature -> (count, mean, variance) while fitting
 
     def fit(self, values):
+        self.partial_fit(values)
+        self.finish_fit()
+
+    # Count, mean and variance of each feature are combined chunk by chunk (Chan et al.)
+    def partial_fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
@@ -28,8 +34,30 @@ class MeanPreprocessor(Preprocessor):
                 continue
 
             X = [v[i] for v in values if v[i] is not None]
-            self.means[i] = float(np.mean(X))
-            self.stds[i] = float(np.std(X))
+            if len(X) == 0:
+                continue
+
+            n, mean, var = len(X), float(np.mean(X)), float(np.var(X))
+            if i in self._moments:
+                n_a, mean_a, var_a = self._moments[i]
+                delta = mean - mean_a
+                total = n_a + n
+                mean = mean_a + delta * n / total
+                var = (n_a * var_a + n * var + delta**2 * n_a * n / total) / total
+                n = total
+            self._moments[i] = (n, mean, var)
+
+    def finish_fit(self):
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            if i not in self._moments:
+                settings.logger.error("No values to fit feature {}".format(i))
+                exit(1)
+
+            _, self.means[i], var = self._moments[i]
+            self.stds[i] = float(np.sqrt(var))
 
             if self.stds[i] == 0:
                 settings.logger.info(
@@ -39,6 +67,8 @@ class MeanPreprocessor(Preprocessor):
                 )
                 self.stds[i] = 1
 
+        self._moments = {}
+
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
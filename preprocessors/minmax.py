@@ -20,6 +20,10 @@ class MinMaxPreprocessor(Preprocessor):
         self.maxs = [None] * len(self.features)
 
     def fit(self, values):
+        self.partial_fit(values)
+        self.finish_fit()
+
+    def partial_fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
@@ -28,8 +32,21 @@ class MinMaxPreprocessor(Preprocessor):
                 continue
 
             X = [v[i] for v in values if v[i] is not None]
-            self.mins[i] = float(np.min(X))
-            self.maxs[i] = float(np.max(X))
+            if len(X) == 0:
+                continue
+
+            low, high = float(np.min(X)), float(np.max(X))
+            self.mins[i] = low if self.mins[i] is None else min(self.mins[i], low)
+            self.maxs[i] = high if self.maxs[i] is None else max(self.maxs[i], high)
+
+    def finish_fit(self):
+        for i in range(len(self.features)):
+            if not self.features[i]:
+                continue
+
+            if self.mins[i] is None:
+                settings.logger.error("No values to fit feature {}".format(i))
+                exit(1)
 
             if self.mins[i] == self.maxs[i]:
                 settings.logger.info(
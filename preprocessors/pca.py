@@ -1,6 +1,7 @@
+import io
 import joblib
-import os
-import random
+
+import numpy as np
 
 from sklearn.decomposition import PCA
 
@@ -14,52 +15,53 @@ class PCAPreprocessor(Preprocessor):
     _name = "pca"
     _description = "Performs a principal component analysis"
 
+    # The fitted PCA is kept as mean and components only. Transforming a value is a
+    # projection onto the components, which avoids the overhead of calling scikit-learn
+    # for each message and is stored as plain arrays in the model file
     def __init__(self, features):
         super().__init__(features)
-        self.encoder = None
+        self.mean = None
+        self.components = None
+        self._projection = None
+
+    def _set_model(self, mean, components):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.components = np.asarray(components, dtype=np.float64)
+        self._projection = np.ascontiguousarray(self.components.T)
 
     def fit(self, values):
         if len(values[0]) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
-        self.encoder = PCA()
-        self.encoder.fit(values)
+        encoder = PCA()
+        encoder.fit(values)
+        self._set_model(encoder.mean_, encoder.components_)
 
     def transform(self, value):
         if len(value) != len(self.features):
             settings.logger.critical("Feature length does not match data length!")
 
-        return self.encoder.transform([value])[0]
+        return (np.asarray(value, dtype=np.float64) - self.mean) @ self._projection
 
     def reset(self):
         pass  # Nothing to reset
 
     def get_fitted_model(self):
-        # Save model to temprary file
-        tmp = ".tmp-{}".format(random.randint(1000, 9999))
-        joblib.dump(self.encoder, tmp, compress=3)
-
-        # Load file to string
-        with open(tmp, "rb") as f:
-            model = list(f.read())
-
-        # Remove temporary file
-        os.remove(tmp)
-
-        return {"features": self.features, "model": model}
+        return {
+            "features": self.features,
+            "mean": self.mean.tolist(),
+            "components": self.components.tolist(),
+        }
 
     @classmethod
     def from_fitted_model(cls, model):
-        # Save model to temporary file
-        tmp = ".tmp-{}".format(random.randint(1000, 9999))
-        with open(tmp, "wb") as f:
-            f.write(bytes(model["model"]))
-
-        # Load model
         pca = PCAPreprocessor(model["features"])
-        pca.encoder = joblib.load(tmp)
 
-        # Remove temprary file
-        os.remove(tmp)
+        # Models of older versions hold the pickled scikit-learn PCA
+        if "model" in model:
+            encoder = joblib.load(io.BytesIO(bytes(model["model"])))
+            pca._set_model(encoder.mean_, encoder.components_)
+        else:
+            pca._set_model(model["mean"], model["components"])
 
         return pca
@@ -13,9 +13,22 @@ class Preprocessor:
     def __init__(self, features: List[bool]):
         self.features = features
 
+    # Fit on all training rows at once, given as list of lists like in transform
     def fit(self, values):
         raise NotImplementedError
 
+    # Preprocessors that can be fitted incrementally implement partial_fit, which is then
+    # called with consecutive chunks of the training rows instead of fit, followed by
+    # finish_fit. Only a chunk of rows is converted to lists at a time
+    def partial_fit(self, values):
+        raise NotImplementedError
+
+    def finish_fit(self):
+        pass
+
+    def supports_partial_fit(self):
+        return type(self).partial_fit is not Preprocessor.partial_fit
+
     def transform(self, values):
         raise NotImplementedError
 
@@ -1,23 +1,46 @@
-from .aggregate import AggregatePreprocessor
-from .categorical import CategoricalPreprocessor
-from .gradient import GradientPreprocessor
-from .indicatenone import IndicateNonePreprocessor
-from .labelencoder import LabelEncoderPreprocessor
-from .mean import MeanPreprocessor
-from .minmax import MinMaxPreprocessor
-from .pca import PCAPreprocessor
+from ipal_iids.registry import Registry
 
-preprocessors = [
-    AggregatePreprocessor,
-    CategoricalPreprocessor,
-    GradientPreprocessor,
-    IndicateNonePreprocessor,
-    LabelEncoderPreprocessor,
-    MeanPreprocessor,
-    MinMaxPreprocessor,
-    PCAPreprocessor,
-]
+# Preprocessor name -> metadata with the "module:class" path. The modules are imported
+# once used only. Further preprocessors are discovered from the
+# "ipal_iids.preprocessors" entry points
+preprocessors = Registry(
+    {
+        "aggregate": {
+            "class": "preprocessors.aggregate:AggregatePreprocessor",
+            "description": "Aggregates multiple vectors into one feature",
+        },
+        "categorical": {
+            "class": "preprocessors.categorical:CategoricalPreprocessor",
+            "description": "Encode as categorical",
+        },
+        "gradient": {
+            "class": "preprocessors.gradient:GradientPreprocessor",
+            "description": "Calculate gradient",
+        },
+        "indicate-none": {
+            "class": "preprocessors.indicatenone:IndicateNonePreprocessor",
+            "description": "Set None to 0 and indicate with new feature",
+        },
+        "label": {
+            "class": "preprocessors.labelencoder:LabelEncoderPreprocessor",
+            "description": "Encode as labels",
+        },
+        "mean": {
+            "class": "preprocessors.mean:MeanPreprocessor",
+            "description": "Scale by mean-standard deviation",
+        },
+        "minmax": {
+            "class": "preprocessors.minmax:MinMaxPreprocessor",
+            "description": "Scale by mininum and maximum",
+        },
+        "pca": {
+            "class": "preprocessors.pca:PCAPreprocessor",
+            "description": "Performs a principal component analysis",
+        },
+    },
+    group="ipal_iids.preprocessors",
+)
 
 
 def get_all_preprocessors():
-    return {preprocessor._name: preprocessor for preprocessor in preprocessors}
+    return preprocessors
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+
+from ipal_iids.arrays import GrowableArray
+
+from .conftest import metaids
+from .test_output import state_msgs, write_msgs
+
+
+def test_growable_rows():
+    array = GrowableArray(rows=True, capacity=2)
+    rows = [[float(i), float(i + 1)] for i in range(10000)]
+    for row in rows:
+        array.append(row)
+
+    assert len(array) == 10000
+    assert array.array().dtype == np.float64
+    assert array.array().tolist() == rows
+
+
+def test_growable_casts_ints():
+    array = GrowableArray()
+    for value in [0, 1.5, 2, True]:
+        array.append(value)
+
+    # bool is not numeric for float64 arrays
+    assert array.array().dtype == object
+    assert array.array().tolist() == [0, 1.5, 2, True]
+
+    array = GrowableArray(rows=True)
+    for row in [[0, 1.5], [2.5, 3]]:  # e.g., the 0 replacing NaN
+        array.append(row)
+    assert array.array().dtype == np.float64
+    assert array.array().tolist() == [[0.0, 1.5], [2.5, 3.0]]
+
+
+def test_growable_fallbacks():
+    array = GrowableArray(rows=True)
+    array.append([1.0, "a"])
+    assert array.array().dtype == object
+    assert array.array().tolist() == [[1.0, "a"]]
+
+    array = GrowableArray(rows=True)
+    array.append([1.0, 2.0])
+    array.append([3.0])
+    assert array.array() == [[1.0, 2.0], [3.0]]
+
+
+def test_growable_spill(tmp_path):
+    array = GrowableArray(rows=True, capacity=2, directory=tmp_path)
+    rows = [[float(i), -float(i)] for i in range(10000)]
+    for row in rows:
+        array.append(row)
+
+    assert isinstance(array.array(), np.memmap)
+    assert array.array().tolist() == rows
+
+    # Non-numeric values are moved to memory
+    array.append(["a", "b"])
+    assert not isinstance(array.array(), np.memmap)
+    assert array.array().tolist() == rows + [["a", "b"]]
+
+
+def test_train_spill(tmp_path):
+    msgs = state_msgs(5000)
+    for msg in msgs:
+        msg["state"]["level"] = msg["timestamp"] % 7
+        msg["malicious"] = False
+    write_msgs(tmp_path / "train.state", msgs)
+    write_msgs(tmp_path / "live.state", msgs[:100])
+
+    config = tmp_path / "minmax.config"
+    config.write_text(
+        json.dumps(
+            {
+                "MinMax": {
+                    "_type": "MinMax",
+                    "features": ["state;switch", "state;level"],
+                    "preprocessors": [
+                        {"method": "minmax", "features": ["state;level"]}
+                    ],
+                    "model-file": None,
+                }
+            }
+        )
+    )
+
+    outputs = []
+    for spill in [[], ["--train.spill", str(tmp_path / "spill")]]:
+        errno, stdout, stderr = metaids(
+            [
+                "--train.state",
+                str(tmp_path / "train.state"),
+                "--live.state",
+                str(tmp_path / "live.state"),
+                "--config",
+                str(config),
+                "--output",
+                "-",
+            ]
+            + spill
+        )
+        assert errno == 0, stderr.decode()
+        outputs.append([json.loads(line)["metrics"] for line in stdout.splitlines()])
+
+    assert outputs[0] == outputs[1]
+    assert list((tmp_path / "spill").iterdir()) == []  # Temporary files removed
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from ipal_iids.batching import batches
+
+
+def stream(*msgs, delays=None):
+    for i, msg in enumerate(msgs):
+        if delays is not None:
+            time.sleep(delays[i])
+        yield msg
+
+
+def test_fixed_batches():
+    msgs = [(False, 0), (False, 1), (False, 2), (True, 3), (False, 4), (False, 5)]
+
+    assert list(batches(iter(msgs), batch_size=2)) == [
+        (False, [0, 1]),
+        (False, [2]),  # Format changes
+        (True, [3]),
+        (False, [4, 5]),
+    ]
+    assert list(batches(iter(msgs))) == [(is_ipal, [msg]) for is_ipal, msg in msgs]
+    assert list(batches(iter([]), batch_size=4)) == []
+
+
+def test_fixed_batches_end_of_input():
+    msgs = [(True, i) for i in range(5)]
+    assert list(batches(iter(msgs), batch_size=3)) == [
+        (True, [0, 1, 2]),
+        (True, [3, 4]),
+    ]
+
+
+def test_timed_batches():
+    msgs = [(False, 0), (False, 1), (False, 2), (True, 3), (False, 4), (False, 5)]
+
+    out = list(batches(stream(*msgs), batch_size=2, max_wait=5))
+    assert out == [
+        (False, [0, 1]),
+        (False, [2]),
+        (True, [3]),
+        (False, [4, 5]),
+    ]
+    assert list(batches(stream(), batch_size=4, max_wait=5)) == []
+
+
+def test_timed_batches_deadline():
+    msgs = [(False, 0), (False, 1), (False, 2)]
+    start = time.monotonic()
+
+    # The last message arrives long after the deadline of the first batch
+    out = list(batches(stream(*msgs, delays=[0, 0, 1]), batch_size=4, max_wait=0.2))
+    assert out == [(False, [0, 1]), (False, [2])]
+    assert time.monotonic() - start < 2
+
+
+def test_timed_batches_end_of_input():
+    start = time.monotonic()
+
+    # The end of input completes the batch without waiting for the deadline
+    out = list(batches(stream((True, 0), (True, 1)), batch_size=4, max_wait=5))
+    assert out == [(True, [0, 1])]
+    assert time.monotonic() - start < 2
+
+
+def test_timed_batches_reader_error():
+    def failing():
+        yield False, 0
+        raise ValueError("broken input")
+
+    out = batches(failing(), batch_size=4, max_wait=5)
+    assert next(out) == (False, [0])
+    with pytest.raises(ValueError, match="broken input"):
+        next(out)
+
+
+# A message which waited in the buffer while the previous batch was processed is
+# yielded at once instead of waiting max_wait seconds again
+def test_timed_batches_deadline_from_arrival():
+    msgs = stream((True, 0), (False, 1), (False, 2), delays=[0, 0, 2])
+    out = batches(msgs, batch_size=4, max_wait=0.3)
+
+    assert next(out) == (True, [0])
+    time.sleep(0.4)  # Processing the batch takes longer than max_wait
+
+    start = time.monotonic()
+    assert next(out) == (False, [1])
+    assert time.monotonic() - start < 0.2
+    assert next(out) == (False, [2])
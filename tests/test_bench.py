@@ -0,0 +1,23 @@
+import logging
+
+import ipal_iids.settings as settings
+from ipal_iids.tools import bench
+
+
+def test_peak_rss_excludes_inherited_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "logger", logging.getLogger("ipal-iids-bench"))
+    for phase, seed in [("train", 0), ("live", 1)]:
+        bench.generate(
+            str(tmp_path / "{}.ipal".format(phase)),
+            str(tmp_path / "{}.state".format(phase)),
+            500,
+            seed=seed,
+            sensors=2,
+        )
+
+    # Memory resident in the benchmarking process is not attributed to the IDS
+    inherited = b"x" * (256 << 20)  # noqa: F841
+
+    result = bench.bench(["MinMax"], str(tmp_path), sensors=2)["MinMax"]
+    assert "error" not in result, result["error"]
+    assert 0 <= result["peak_rss_bytes"] < 128 << 20
@@ -0,0 +1,118 @@
+import json
+
+import numpy as np
+import pytest
+
+import ipal_iids.cache as cache
+import ipal_iids.dataset as dataset
+import ipal_iids.settings as settings
+
+from .conftest import metaids
+from .test_output import state_msgs, write_msgs
+
+
+@pytest.fixture
+def train_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "train_cache", str(tmp_path / "cache"))
+    (tmp_path / "cache").mkdir()
+
+    path = tmp_path / "train.state"
+    write_msgs(path, state_msgs(10))
+    yield path
+    dataset.clear()
+
+
+def test_key_without_cache(train_file, monkeypatch):
+    assert cache.key("-", ["params"]) is None
+
+    monkeypatch.setattr(settings, "train_cache", None)
+    assert cache.key(train_file, ["params"]) is None
+    assert cache.load("0" * 40) is None
+
+
+def test_key_invalidation(train_file):
+    key = cache.key(train_file, [["state;switch"], False])
+    assert key == cache.key(str(train_file), [["state;switch"], False])
+    assert key != cache.key(train_file, [["state;switch"], True])  # Parameters
+
+    write_msgs(train_file, state_msgs(10, start=1))  # Content
+    dataset.clear()
+    assert key != cache.key(train_file, [["state;switch"], False])
+
+
+def test_save_and_load(train_file):
+    key = cache.key(train_file, [])
+    assert cache.load(key) is None
+
+    events = np.arange(20, dtype=np.float64).reshape(10, 2)
+    annotations = np.zeros(10, dtype=bool)
+    timestamps = np.array(["t{}".format(i) for i in range(10)], dtype=object)
+    cache.save(key, events, annotations, timestamps)
+
+    loaded = cache.load(key)
+    assert isinstance(loaded[0], np.memmap)  # Numeric arrays are memory-mapped
+    assert loaded[2].dtype == object
+    for array, expected in zip(loaded, [events, annotations, timestamps]):
+        assert np.array_equal(array, expected)
+
+
+def test_ragged_features_not_cached(train_file):
+    key = cache.key(train_file, [])
+    cache.save(key, [[1], [2, 3]], np.zeros(2, dtype=bool), np.zeros(2))
+    assert cache.load(key) is None
+
+
+def run_minmax(tmp_path, features):
+    config = tmp_path / "minmax.config"
+    config.write_text(
+        json.dumps(
+            {"MinMax": {"_type": "MinMax", "features": features, "model-file": None}}
+        )
+    )
+
+    errno, stdout, stderr = metaids(
+        [
+            "--train.state",
+            str(tmp_path / "train.state"),
+            "--live.state",
+            str(tmp_path / "live.state"),
+            "--config",
+            str(config),
+            "--train.cache",
+            str(tmp_path / "cache"),
+            "--output",
+            "-",
+            "--log",
+            "info",
+        ]
+    )
+    assert errno == 0, stderr.decode()
+    return [json.loads(line)["ids"] for line in stdout.splitlines()], stderr.decode()
+
+
+def test_cache_cli(tmp_path):
+    msgs = state_msgs(20)
+    for msg in msgs:
+        msg["state"]["level"] = msg["timestamp"] % 5
+        msg["malicious"] = False
+    write_msgs(tmp_path / "train.state", msgs)
+    write_msgs(tmp_path / "live.state", msgs[:5])
+
+    # Cached features are reused until the training file or the features change
+    features = ["state;switch", "state;level"]
+    alerts, stderr = run_minmax(tmp_path, features)
+    assert "Saved features to cache" in stderr
+    assert len(list((tmp_path / "cache").iterdir())) == 3
+
+    cached, stderr = run_minmax(tmp_path, features)
+    assert "Loading features from cache" in stderr
+    assert cached == alerts
+
+    _, stderr = run_minmax(tmp_path, features[:1])
+    assert "Saved features to cache" in stderr
+
+    msgs[3]["state"]["level"] = 9
+    write_msgs(tmp_path / "train.state", msgs)
+    _, stderr = run_minmax(tmp_path, features)
+    assert "Saved features to cache" in stderr
+    assert len(list((tmp_path / "cache").iterdir())) == 9
@@ -0,0 +1,72 @@
+import pytest
+
+import ipal_iids.dataset as dataset
+import ipal_iids.settings as settings
+
+from ids.interarrivaltime.Mean import InterArrivalTimeMean
+from ids.simple.minmax import MinMax
+from ipal_iids.iids import require_training_fields
+
+from .test_output import state_msgs, write_msgs
+
+
+@pytest.fixture
+def train_file(tmp_path):
+    path = tmp_path / "train.state"
+    write_msgs(path, state_msgs(10))
+    yield path
+    dataset.clear()
+
+
+def test_shared_file_parsed_once(train_file):
+    dataset.require(train_file, [["state", "switch"]])
+    dataset.require(train_file, [["timestamp"]])
+
+    msgs = dataset.load(train_file)
+    assert msgs is dataset.load(train_file)
+    assert msgs[1] == {"state": {"switch": 1}, "timestamp": 1.0}
+
+
+def test_single_consumer_streamed(train_file):
+    dataset.require(train_file, None)
+
+    msgs = dataset.load(train_file)
+    assert not isinstance(msgs, list)
+    assert list(msgs) == state_msgs(10)
+
+
+def test_spill_streams_shared_file(train_file, monkeypatch):
+    monkeypatch.setattr(settings, "train_spill", str(train_file.parent))
+    dataset.require(train_file, None)
+    dataset.require(train_file, None)
+
+    dataset.preload()
+    msgs = dataset.load(train_file)
+    assert not isinstance(msgs, list)
+    assert list(msgs) == state_msgs(10)
+
+
+def test_require_training_file_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        settings,
+        "idss",
+        {
+            "MinMax": {"_type": "MinMax", "features": ["state;switch"]},
+            "Mean": {"_type": "inter-arrival-mean"},
+        },
+    )
+    minmax = MinMax(name="MinMax")
+    mean = InterArrivalTimeMean(name="Mean")
+
+    # State messages take precedence, IPAL-only IDSs still read the IPAL messages
+    monkeypatch.setattr(settings, "train_ipal", str(tmp_path / "train.ipal"))
+    monkeypatch.setattr(settings, "train_state", str(tmp_path / "train.state"))
+    require_training_fields([minmax, mean])
+    assert dataset._consumers == {settings.train_ipal: 1, settings.train_state: 1}
+    assert dataset._fields[settings.train_state] == minmax.requires_fields()
+    dataset.clear()
+
+    monkeypatch.setattr(settings, "train_state", None)
+    require_training_fields([minmax, mean])
+    assert dataset._consumers == {settings.train_ipal: 2}
+    dataset.clear()
@@ -0,0 +1,120 @@
+import gzip
+import json
+import random
+
+from subprocess import PIPE, Popen
+
+import pytest
+
+from ids.ids import MetaIDS
+from ipal_iids.tools.extend_alarms import extend_alarms
+
+from .test_output import write_msgs
+
+
+def live_msgs(n):
+    return [
+        {"timestamp": float(t), "ids": False, "metrics": {"A": 0, "B": 0}}
+        for t in range(n)
+    ]
+
+
+def read_msgs(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+# Apply the adjustments as the original implementation, i.e., one offset at a time
+def naive_extend(msgs):
+    msgs = json.loads(json.dumps(msgs))
+    for i, msg in enumerate(msgs):
+        for adjust in msg.pop("adjust", []):
+            start, end = adjust[0], adjust[-3]
+            for offset in range(start, end + 1):
+                out = msgs[max(i + offset, 0)]
+                out["ids"] = adjust[-2]
+                out["metrics"] = {k: adjust[-1] for k in out["metrics"]}
+    return msgs
+
+
+def test_adjust_ranges():
+    offsets = list(range(-5, 1))
+    alerts = [True, True, True, False, True, False]
+    metrics = [0.9, 0.9, 0.9, 0.1, 0.8, 0.2]
+
+    assert MetaIDS._adjust_ranges(offsets, alerts, metrics) == [
+        [-5, -3, True, 0.9],
+        [-2, False, 0.1],
+        [-1, True, 0.8],
+        [0, False, 0.2],
+    ]
+    assert MetaIDS._adjust_ranges([], [], []) == []
+
+
+def test_ranges_and_triples(tmp_path):
+    msgs = live_msgs(10)
+    msgs[4]["adjust"] = [[-3, -1, True, 1], [0, False, 0]]
+    msgs[6]["adjust"] = [[-1, True, 0.5]]  # Format of older versions
+    msgs[9]["adjust"] = [[-2, 0, True, 2], [-1, False, 0]]  # Overlapping
+
+    write_msgs(tmp_path / "out.json", msgs)
+    extend_alarms(str(tmp_path / "out.json"))
+
+    out = read_msgs(tmp_path / "out.json")
+    assert out == naive_extend(msgs)
+    alerts = [False, True, True, True, False, True, False, True, False, True]
+    assert [msg["ids"] for msg in out] == alerts
+    assert out[5]["metrics"] == {"A": 0.5, "B": 0.5}
+    assert out[8]["metrics"] == {"A": 0, "B": 0}
+    assert all("adjust" not in msg for msg in out)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_adjustments(tmp_path, seed):
+    rng = random.Random(seed)
+    msgs = live_msgs(50)
+    for i, msg in enumerate(msgs):
+        if rng.random() < 0.3:
+            msg["adjust"] = []
+            for _ in range(rng.randint(1, 3)):
+                start = -rng.randint(0, i + 3)  # Possibly before the dataset start
+                end = rng.randint(start, 0)
+                alert = rng.random() < 0.5
+                entry = [start, end, alert, rng.random()]
+                if start == end and rng.random() < 0.5:
+                    entry = [start, alert, entry[-1]]
+                msg["adjust"].append(entry)
+
+    write_msgs(tmp_path / "out.json.gz", msgs)
+    extend_alarms(str(tmp_path / "out.json.gz"))
+
+    with gzip.open(tmp_path / "out.json.gz", "rt") as f:
+        assert [json.loads(line) for line in f] == naive_extend(msgs)
+
+
+def run_extend_alarms(args, stdin):
+    p = Popen(["./ipal-extend-alarms"] + args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    stdout, stderr = p.communicate(stdin.encode())
+    return p.returncode, stdout.decode(), stderr.decode()
+
+
+def test_stdin_lookback():
+    msgs = live_msgs(10)
+    msgs[3]["adjust"] = [[-2, True, 1]]  # Within the lookback
+    msgs[6]["adjust"] = [[-4, 0, True, 2]]  # Reaches past the lookback
+    msgs[9]["adjust"] = [[-5, -4, True, 3]]  # Written completely
+    stdin = "".join(json.dumps(msg) + "\n" for msg in msgs)
+
+    errno, stdout, stderr = run_extend_alarms(["--lookback", "2", "-"], stdin)
+    assert errno == 0, stderr
+
+    # Messages written already are not changed anymore
+    msgs[6]["adjust"] = [[-2, 0, True, 2]]
+    del msgs[9]["adjust"]
+    assert [json.loads(line) for line in stdout.splitlines()] == naive_extend(msgs)
+    assert stderr.count("exceeds the lookback of 2 messages") == 2
+
+
+def test_stdin_requires_lookback():
+    errno, stdout, stderr = run_extend_alarms(["-"], "")
+    assert errno == 1
+    assert "Option '--lookback' is required to read from stdin" in stderr
@@ -0,0 +1,64 @@
+import zlib
+
+import pytest
+
+import ipal_iids.settings as settings
+
+from ids.oracles.DummyIDS import DummyIDS
+
+
+@pytest.fixture
+def ids(monkeypatch):
+    monkeypatch.setattr(settings, "idss", {"Dummy": {"_type": "Dummy"}})
+    return DummyIDS(name="Dummy")
+
+
+def ipal_msg(**fields):
+    msg = {
+        "src": "192.168.0.1:502",
+        "dest": "192.168.0.2:502",
+        "type": 3,
+        "activity": "interrogate",
+        "protocol": "modbus",
+        "length": 12,
+        "data": {"b": [1, 2], "a": 0.5},
+    }
+    msg.update(fields)
+    return msg
+
+
+def test_crc32_canonical_json(ids):
+    expected = zlib.crc32(
+        b'["192.168.0.1:502","192.168.0.2:502",3,"interrogate"]'
+        b'["modbus",12,{"a":0.5,"b":[1,2]}]'
+    )
+    assert ids._crc32_fingerprint(ipal_msg()) == expected
+    assert ids._msg_hash(ipal_msg(), nbytes=2, function="crc32") == expected & 0xFFFF
+
+    # Independent of the order of dict keys and the memoized prefixes
+    reordered = ipal_msg(data={"a": 0.5, "b": [1, 2]})
+    assert ids._crc32_fingerprint(reordered) == expected
+    ids._hash_prefixes.clear()
+    assert ids._crc32_fingerprint(reordered) == expected
+
+
+def test_crc32_distinguishes_types(ids):
+    fingerprints = {
+        ids._crc32_fingerprint(ipal_msg(type=value)) for value in [1, 1.0, True, "1"]
+    }
+    assert len(fingerprints) == 4
+    assert ids._crc32_fingerprint(ipal_msg(type=[1])) != ids._crc32_fingerprint(
+        ipal_msg(type=1)
+    )
+
+
+def test_crc32_memo_bounded(ids, monkeypatch):
+    monkeypatch.setattr(ids, "_hash_prefixes_size", 3)
+
+    fingerprints = [ids._crc32_fingerprint(ipal_msg(type=i)) for i in range(3)]
+    ids._crc32_fingerprint(ipal_msg(type=0))  # Recently used again
+    ids._crc32_fingerprint(ipal_msg(type=3))
+
+    assert [key[0][2] for key in ids._hash_prefixes] == [2, 0, 3]
+    assert [ids._crc32_fingerprint(ipal_msg(type=i)) for i in range(3)] == fingerprints
+    assert len(ids._hash_prefixes) == 3
@@ -0,0 +1,166 @@
+import random
+
+from collections import Counter
+
+import pytest
+
+import ipal_iids.settings as settings
+
+from ids.simple.histogram import Histogram, _Window
+
+from .test_output import write_msgs
+
+
+# Sliding window of the original implementation, which recounts each window
+class NaiveWindow:
+    def __init__(self, values, low, high, size):
+        self.values = list(values)
+        self.low = dict(zip(self.values, low))
+        self.high = dict(zip(self.values, high))
+        self.size = size
+        self.buffer = []
+
+    def add(self, value):
+        self.buffer.append(value)
+        if len(self.buffer) > self.size:
+            self.buffer.pop(0)
+        return len(self.buffer) == self.size
+
+    def violated(self):
+        counts = Counter(self.buffer)
+        return any(
+            not self.low[val] <= counts[val] <= self.high[val] for val in self.values
+        )
+
+
+def histogram(monkeypatch, **config):
+    config = {"_type": "Histogram", "model-file": None, **config}
+    monkeypatch.setattr(settings, "idss", {"Histogram": config})
+    return Histogram(name="Histogram")
+
+
+# Messages with discrete sensors cycling through 3 values or taking random values, of
+# which a few are unknown, i.e., 3
+def sensor_msgs(rng, n, sensors=2, cycle=True):
+    def value(t):
+        if cycle:
+            return (t + (rng.random() < 0.1)) % 3
+        return 3 if rng.random() < 0.02 else rng.randrange(3)
+
+    return [
+        {
+            "timestamp": float(t),
+            "malicious": False,
+            "state": {
+                **{"s{}".format(k): value(t) for k in range(sensors)},
+                "noise": rng.random(),  # Too many values, ignored
+            },
+        }
+        for t in range(n)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_window_matches_naive(seed):
+    rng = random.Random(seed)
+    values = ["a", "b", "c", "d"][: rng.randint(1, 4)]
+    size = rng.randint(1, 12)
+    low = [rng.uniform(-1, size / 2) for _ in values]
+    high = [lo + rng.uniform(0, size) for lo in low]
+
+    window = _Window(values, low, high, size)
+    naive = NaiveWindow(values, low, high, size)
+    for code in [rng.randrange(len(values)) for _ in range(3 * size)]:
+        complete = window.add(code)
+        assert complete == naive.add(values[code])
+        assert (window.violations > 0) == naive.violated()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_live_matches_naive(monkeypatch, tmp_path, seed):
+    rng = random.Random(seed)
+    size = rng.randint(2, 8)
+    ids = histogram(
+        monkeypatch,
+        features=["state;s0", "state;s1", "state;noise"],
+        window_size=size,
+        threshold=rng.choice([0.0, 0.5, 1.0]),
+    )
+    write_msgs(tmp_path / "train.state", sensor_msgs(rng, 200))
+    ids.train(state=str(tmp_path / "train.state"))
+
+    naive = {}
+    for i, hist in ids.hist.items():
+        if hist is not None:
+            threshold = ids.settings["threshold"]
+            low = [
+                tmin - ids.deltas[i][val] * threshold for val, (tmin, _) in hist.items()
+            ]
+            high = [
+                tmax + ids.deltas[i][val] * threshold for val, (_, tmax) in hist.items()
+            ]
+            naive[i] = NaiveWindow(hist.keys(), low, high, size)
+    assert sorted(naive) == [0, 1]
+
+    # Skewed counts violate the histogram, unknown values alert and are not added to
+    # the window. The first windows are shorter than the window size and not checked
+    alerts = 0
+    for msg in sensor_msgs(rng, 200, cycle=False):
+        expected = False
+        for i, window in naive.items():
+            value = float(msg["state"]["s{}".format(i)])
+            if value not in window.low:
+                expected = True
+            elif window.add(value) and window.violated():
+                expected = True
+
+        assert ids.new_state_msg(msg) == (expected, 1 if expected else 0)
+        alerts += expected
+
+    assert 0 < alerts < 200
+
+
+# Minimum and maximum count of each value over all complete windows of the original
+# implementation
+def naive_hist(values, size):
+    counts = {val: [] for val in set(values)}
+    window = NaiveWindow(counts.keys(), [0] * len(counts), [0] * len(counts), size)
+    for value in values:
+        if window.add(value):
+            current = Counter(window.buffer)
+            for val in counts:
+                counts[val].append(current[val])
+
+    return {val: [min(c), max(c)] for val, c in counts.items()}
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_training_matches_naive(monkeypatch, tmp_path, seed):
+    rng = random.Random(seed)
+    msgs = sensor_msgs(rng, rng.randint(1, 60), cycle=seed % 2 == 0)
+    size = rng.randint(1, len(msgs))  # Including a single window
+    ids = histogram(
+        monkeypatch,
+        features=["state;s0", "state;s1", "state;noise"],
+        window_size=size,
+        discrete_threshold=4,
+    )
+    write_msgs(tmp_path / "train.state", msgs)
+    ids.train(state=str(tmp_path / "train.state"))
+
+    for i in range(2):
+        values = [float(msg["state"]["s{}".format(i)]) for msg in msgs]
+        expected = naive_hist(values, size)
+        assert ids.hist[i] == expected
+        assert ids.deltas[i] == {v: (hi - lo) / 2 for v, (lo, hi) in expected.items()}
+
+    assert ids.hist[2] is None or len(msgs) <= 4  # Too many values
+
+
+def test_training_shorter_than_window(monkeypatch, tmp_path):
+    rng = random.Random(0)
+    ids = histogram(monkeypatch, features=["state;s0"], window_size=20)
+    write_msgs(tmp_path / "train.state", sensor_msgs(rng, 10))
+
+    with pytest.raises(SystemExit):
+        ids.train(state=str(tmp_path / "train.state"))
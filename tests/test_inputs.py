@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from ipal_iids.inputs import merge, reorder
+
+
+def key(item):
+    return item[0]
+
+
+def test_merge_ordered_streams():
+    a = [(0, "a"), (2, "a"), (2, "a2"), (5, "a")]
+    b = [(1, "b"), (2, "b"), (3, "b")]
+    c = [(2, "c")]
+
+    # Equal keys are emitted in the order of the streams
+    assert list(merge([iter(a), iter(b), iter(c)], key)) == [
+        (0, "a"),
+        (1, "b"),
+        (2, "a"),
+        (2, "a2"),
+        (2, "b"),
+        (2, "c"),
+        (3, "b"),
+        (5, "a"),
+    ]
+    assert list(merge([iter(a)], key)) == a
+    assert list(merge([iter([]), iter(b)], key)) == b
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_merge_random_streams(seed):
+    rng = random.Random(seed)
+    streams = [
+        sorted((rng.randint(0, 20), s, i) for i in range(rng.randint(0, 15)))
+        for s in range(rng.randint(1, 4))
+    ]
+    # Sorting is stable, hence equal keys keep the order of the streams
+    expected = sorted((item for stream in streams for item in stream), key=key)
+
+    assert list(merge([iter(stream) for stream in streams], key)) == expected
+
+
+def test_reorder_within_window(caplog):
+    items = [(1, "a"), (0, "b"), (3, "c"), (2, "d"), (2, "e"), (4, "f")]
+
+    assert list(reorder(iter(items), key, 2)) == sorted(items, key=key)
+    assert list(reorder(iter([]), key, 2)) == []
+    assert "out of order" not in caplog.text
+
+
+def test_reorder_beyond_window(caplog):
+    items = [(3, "a"), (4, "b"), (5, "c"), (0, "d"), (6, "e"), (1, "f")]
+
+    # Items delayed by more than the window are emitted late, a warning is logged once
+    out = list(reorder(iter(items), key, 1))
+    assert out == [(3, "a"), (4, "b"), (0, "d"), (5, "c"), (1, "f"), (6, "e")]
+    assert caplog.text.count("out of order by more than 1 messages") == 1
+
+
+def test_merge_reorders_each_stream():
+    a = [(1, "a"), (0, "a"), (4, "a")]
+    b = [(3, "b"), (2, "b")]
+
+    assert list(merge([iter(a), iter(b)], key, window=1)) == [
+        (0, "a"),
+        (1, "a"),
+        (2, "b"),
+        (3, "b"),
+        (4, "a"),
+    ]
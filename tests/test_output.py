@@ -0,0 +1,191 @@
+import gzip
+import json
+import signal
+import time
+
+from subprocess import PIPE, Popen
+
+from ipal_iids.output import OutputWriter, splice_fields
+
+from .conftest import metaids
+
+
+def write_msgs(path, msgs):
+    content = "".join(json.dumps(msg) + "\n" for msg in msgs)
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "wt") as f:
+            f.write(content)
+    else:
+        path.write_text(content)
+
+
+def state_msgs(n, start=0.0):
+    return [
+        {"id": i, "timestamp": start + i, "state": {"switch": i % 2}} for i in range(n)
+    ]
+
+
+def dummy_config(path):
+    config = {"Dummy": {"_type": "Dummy", "model-file": None, "ids-value": False}}
+    path.write_text(json.dumps(config))
+    return path
+
+
+def test_splice_fields():
+    line = '{"timestamp": 1.5, "state": {"a": 1}}\n'
+    msg = {"timestamp": 1.5, "ids": True, "metrics": {"Dummy": None}}
+
+    out = splice_fields(line, msg)
+    assert out.startswith('{"timestamp": 1.5, "state": {"a": 1}, "ids": true')
+    assert json.loads(out) == {
+        "timestamp": 1.5,
+        "state": {"a": 1},
+        "ids": True,
+        "metrics": {"Dummy": None},
+    }
+
+
+def test_splice_fields_replaces_existing_fields():
+    line = '{"timestamp": 1, "ids": false, "metrics": {"old": 1}}\n'
+    msg = {"timestamp": 1, "ids": True, "metrics": {"new": 2}}
+
+    out = splice_fields(line, msg)
+    assert out.count('"ids"') == 1
+    assert json.loads(out) == {"timestamp": 1, "ids": True, "metrics": {"new": 2}}
+
+
+def test_passthrough_gz_input(tmp_path):
+    write_msgs(tmp_path / "train.state", state_msgs(10))
+    write_msgs(tmp_path / "live.state.gz", state_msgs(10, start=10))
+
+    errno, stdout, stderr = metaids(
+        [
+            "--train.state",
+            str(tmp_path / "train.state"),
+            "--live.state",
+            str(tmp_path / "live.state.gz"),
+            "--config",
+            str(dummy_config(tmp_path / "dummy.config")),
+            "--output",
+            "-",
+            "--output.passthrough",
+        ]
+    )
+    assert errno == 0, stderr.decode()
+
+    lines = stdout.decode().splitlines()
+    assert len(lines) == 10
+    for line, msg in zip(lines, state_msgs(10, start=10)):
+        assert line.startswith(json.dumps(msg)[:-1])  # Input line copied as it is
+
+        msg = json.loads(line)
+        assert msg["ids"] is False
+        assert msg["metrics"] == {"Dummy": 1}
+
+
+class RecordingFile:
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+        self.closed = False
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_output_writer_buffer_size():
+    fd = RecordingFile()
+    writer = OutputWriter(fd, buffer_size=10, flush_interval=0)
+
+    writer.write("aaaa\n")
+    assert fd.writes == []
+    writer.write("bbbbb\n")  # Exceeds the buffer size
+    assert fd.writes == ["aaaa\nbbbbb\n"]
+
+    writer.write("c\n")
+    writer.close()
+    assert fd.writes == ["aaaa\nbbbbb\n", "c\n"]
+    assert fd.closed
+
+
+def test_output_writer_flush_on_alert():
+    fd = RecordingFile()
+    writer = OutputWriter(fd, flush_interval=0, flush_on_alert=True)
+
+    writer.write("a\n")
+    writer.write("b\n", alert=True)
+    assert fd.writes == ["a\nb\n"]
+
+    writer.write("c\n")
+    writer.close(close_fd=False)
+    assert fd.writes == ["a\nb\n", "c\n"]
+    assert not fd.closed
+
+    fd = RecordingFile()
+    writer = OutputWriter(fd, flush_interval=0)
+    writer.write("a\n", alert=True)  # Alerts are buffered by default
+    assert fd.writes == []
+    writer.close()
+
+
+def test_output_writer_flush_interval():
+    fd = RecordingFile()
+    writer = OutputWriter(fd, flush_interval=0.05)
+
+    writer.write("a\n")
+    deadline = time.monotonic() + 5
+    while fd.writes == [] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fd.writes == ["a\n"]  # Written by the background thread
+
+    writer.close()
+    assert fd.writes == ["a\n"]
+
+
+def test_sigterm_flushes_output(tmp_path):
+    write_msgs(tmp_path / "train.state", state_msgs(10))
+    p = Popen(
+        [
+            "./ipal-iids",
+            "--train.state",
+            str(tmp_path / "train.state"),
+            "--live.state",
+            "-",
+            "--config",
+            str(dummy_config(tmp_path / "dummy.config")),
+            "--output",
+            str(tmp_path / "out.state"),
+            "--output.flush-interval",
+            "0",
+            "--log",
+            "info",
+        ],
+        stdin=PIPE,
+        stderr=PIPE,
+        universal_newlines=True,
+    )
+
+    for line in p.stderr:  # Wait for the live phase
+        if "Start IDS live" in line:
+            break
+
+    # Messages processed before the signal are buffered but not written yet
+    p.stdin.write("".join(json.dumps(msg) + "\n" for msg in state_msgs(5, start=10)))
+    p.stdin.flush()
+    time.sleep(1)
+    assert (tmp_path / "out.state").read_text() == ""
+
+    p.send_signal(signal.SIGTERM)
+    _, stderr = p.communicate()
+    assert p.returncode == 128 + signal.SIGTERM, stderr
+
+    out = [
+        json.loads(line) for line in (tmp_path / "out.state").read_text().splitlines()
+    ]
+    assert [msg["timestamp"] for msg in out] == [10.0, 11.0, 12.0, 13.0, 14.0]
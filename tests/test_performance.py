@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import time
+
+from pathlib import Path
+
+import pytest
+
+import ipal_iids.settings as settings
+from ipal_iids.tools import bench
+
+# Throughput of the IDSs on a fixed synthetic dataset compared to a stored baseline. The
+# throughput is given relative to the speed of decoding the messages with json.loads,
+# such that the baseline carries over to machines of different speed. A test fails if
+# the relative throughput drops below (1 - tolerance) times the baseline. As it still
+# depends on the machine and its load, the tests only run with IPAL_PERF=1, e.g., on a
+# dedicated machine. Run with IPAL_PERF_UPDATE=1 to store the current throughput as new
+# baseline, e.g., after an intended change or if the baseline does not match a machine
+BASELINE = Path(__file__).parent / "performance_baseline.json"
+TOLERANCE = float(os.environ.get("IPAL_PERF_TOLERANCE", 0.4))
+UPDATE = os.environ.get("IPAL_PERF_UPDATE", "0") == "1"
+ENABLED = UPDATE or os.environ.get("IPAL_PERF", "0") == "1"
+
+pytestmark = pytest.mark.skipif(
+    not ENABLED, reason="Performance tests run with IPAL_PERF=1 only"
+)
+
+PERFIDSNAMES = [
+    "DecisionTree",
+    "ExtraTrees",
+    "Histogram",
+    "IsolationForest",
+    "MinMax",
+    "NaiveBayes",
+    "RandomForest",
+    "SVM",
+    "Steadytime",
+    "inter-arrival-mean",
+    "inter-arrival-range",
+]
+METRICS = ["train_msgs_per_second", "live_msgs_per_second"]
+
+WORKLOAD = {"train_msgs": 10000, "live_msgs": 20000, "sensors": 8, "batch_size": 64}
+
+
+# Messages per second decoded with json.loads, best of three runs
+def reference_msgs_per_second(filename):
+    with open(filename) as f:
+        lines = f.readlines()
+
+    seconds = []
+    for _ in range(3):
+        start = time.perf_counter()
+        for line in lines:
+            json.loads(line)
+        seconds.append(time.perf_counter() - start)
+
+    return len(lines) / min(seconds)
+
+
+@pytest.fixture(scope="module")
+def results(tmp_path_factory):
+    settings.logger = logging.getLogger("ipal-iids-bench")
+    workdir = str(tmp_path_factory.mktemp("bench"))
+
+    for phase, msgs, seed in [
+        ("train", WORKLOAD["train_msgs"], 0),
+        ("live", WORKLOAD["live_msgs"], 1),
+    ]:
+        bench.generate(
+            os.path.join(workdir, "{}.ipal".format(phase)),
+            os.path.join(workdir, "{}.state".format(phase)),
+            msgs,
+            seed=seed,
+            sensors=WORKLOAD["sensors"],
+            attacks=5,
+        )
+
+    results = bench.bench(
+        PERFIDSNAMES,
+        workdir,
+        sensors=WORKLOAD["sensors"],
+        batch_size=WORKLOAD["batch_size"],
+    )
+
+    reference = reference_msgs_per_second(os.path.join(workdir, "live.state"))
+    for result in results.values():
+        for metric in METRICS:
+            if metric in result:
+                result[metric] /= reference
+
+    if UPDATE:
+        baseline = {
+            "workload": WORKLOAD,
+            "unit": "throughput relative to decoding the messages with json.loads",
+            "idss": {
+                name: {metric: result[metric] for metric in METRICS}
+                for name, result in results.items()
+                if "error" not in result
+            },
+        }
+        with BASELINE.open("w") as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+            f.write("\n")
+
+    return results
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with BASELINE.open() as f:
+        baseline = json.load(f)
+
+    assert baseline["workload"] == WORKLOAD, "Baseline outdated, update it"
+    return baseline["idss"]
+
+
+@pytest.mark.parametrize("metric", METRICS)
+@pytest.mark.parametrize("idsname", PERFIDSNAMES)
+def test_throughput(results, baseline, idsname, metric):
+    result = results[idsname]
+    assert "error" not in result, result["error"]
+    assert idsname in baseline, "No baseline for {}, update it".format(idsname)
+
+    expected = baseline[idsname][metric] * (1 - TOLERANCE)
+    assert result[metric] >= expected, "{} of {} dropped to {:.3f} ({:.3f})".format(
+        metric, idsname, result[metric], baseline[idsname][metric]
+    )
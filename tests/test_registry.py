@@ -0,0 +1,84 @@
+import subprocess
+import sys
+
+import pytest
+
+import ipal_iids.registry as registry
+
+from ids.utils import get_all_iidss
+from ipal_iids.registry import Registry
+from preprocessors.utils import get_all_preprocessors
+
+
+class EntryPoint:
+    def __init__(self, name, entry):
+        self.name = name
+        self._entry = entry
+
+    def load(self):
+        return self._entry
+
+
+def test_metadata_does_not_import():
+    code = (
+        "import sys\n"
+        "from ids.utils import get_all_iidss\n"
+        "from preprocessors.utils import get_all_preprocessors\n"
+        "for registry in [get_all_iidss(), get_all_preprocessors()]:\n"
+        "    for name in registry:\n"
+        "        assert registry.metadata(name)['description'] != ''\n"
+        "loaded = [m for m in sys.modules if m.split('.')[0] in\n"
+        "    ['tensorflow', 'sklearn', 'ids', 'preprocessors']]\n"
+        "print(' '.join(sorted(loaded)))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.split() == [
+        "ids",
+        "ids.utils",
+        "preprocessors",
+        "preprocessors.utils",
+    ]
+
+
+@pytest.mark.parametrize("name", list(get_all_iidss()))
+def test_ids_metadata_matches_class(name):
+    metadata = get_all_iidss().metadata(name)
+    try:
+        cls = get_all_iidss()[name]
+    except ImportError as e:
+        pytest.skip("{} not available: {}".format(name, e))
+
+    assert set(metadata["requires"]) == set(cls._requires)
+
+
+def test_plugin_discovery(monkeypatch):
+    class Plugin:
+        _description = "Loaded plugin"
+        _requires = ["live.state"]
+
+    plugins = [
+        EntryPoint("Dict", {"class": "ids.oracles.DummyIDS:DummyIDS", "requires": []}),
+        EntryPoint("Path", "ids.oracles.OptimalIDS:OptimalIDS"),
+        EntryPoint("Class", Plugin),
+        EntryPoint("Known", "unknown.module:Unknown"),
+    ]
+    monkeypatch.setattr(registry, "_entry_points", lambda group: plugins)
+
+    plugin_registry = Registry({"Known": "ids.oracles.DummyIDS:DummyIDS"}, group="g")
+    assert list(plugin_registry) == ["Known", "Dict", "Path", "Class"]
+    assert plugin_registry.metadata("Dict")["requires"] == []
+    assert plugin_registry.metadata("Path")["description"] == ""
+    assert plugin_registry.metadata("Class") == {
+        "name": "Class",
+        "description": "Loaded plugin",
+        "requires": ["live.state"],
+    }
+    assert plugin_registry["Class"] is Plugin
+    assert plugin_registry["Known"].__name__ == "DummyIDS"
+
+
+def test_preprocessors_listed():
+    assert "pca" in get_all_preprocessors()
+    assert get_all_preprocessors().metadata("pca")["description"] != ""
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+import ipal_iids.settings as settings
+
+from ids.simple.steadytime import SteadyTime
+
+from .test_output import write_msgs
+
+
+def steadytime(monkeypatch, **config):
+    config = {"_type": "Steadytime", "model-file": None, **config}
+    monkeypatch.setattr(settings, "idss", {"Steadytime": config})
+    return SteadyTime(name="Steadytime")
+
+
+# Minimum and maximum number of events each value is kept, looping over the events as
+# the original implementation. The last run is not complete and ignored
+def naive_times(values):
+    times = {val: [] for val in values}
+    current, length = values[0], 0
+    for value in values:
+        if value == current:
+            length += 1
+        else:
+            times[current].append(length)
+            current, length = value, 1
+
+    return {val: [min(t), max(t)] if len(t) > 0 else None for val, t in times.items()}
+
+
+# Values of a sensor kept for a random number of events
+def runs(rng, n, values):
+    out = []
+    while len(out) < n:
+        out += [rng.choice(values)] * rng.randint(1, 6)
+    return out[:n]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_training_matches_naive(monkeypatch, tmp_path, seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 80)
+    sensors = [runs(rng, n, list(range(rng.randint(1, 4)))) for _ in range(2)]
+    sensors.append([rng.random() for _ in range(n)])  # Too many values, ignored
+
+    msgs = [
+        {
+            "timestamp": float(t),
+            "malicious": False,
+            "state": {"s{}".format(k): values[t] for k, values in enumerate(sensors)},
+        }
+        for t in range(n)
+    ]
+    write_msgs(tmp_path / "train.state", msgs)
+
+    ids = steadytime(
+        monkeypatch,
+        features=["state;s0", "state;s1", "state;s2"],
+        discrete_threshold=4,
+    )
+    ids.train(state=str(tmp_path / "train.state"))
+
+    for i in range(2):
+        expected = naive_times([float(v) for v in sensors[i]])
+        assert ids.time[i] == expected
+        assert ids.deltas[i] == {
+            v: None if t is None else (t[1] - t[0]) / 2 for v, t in expected.items()
+        }
+
+    assert ids.time[2] is None or n <= 4